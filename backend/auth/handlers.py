@@ -0,0 +1,206 @@
+import json
+import math
+import os
+import random
+import string
+from datetime import datetime, timedelta
+from typing import Dict, Any
+
+from shared.core import (JSON_HEADERS, dispatch_action, get_client_ip, get_session_token, get_write_position,
+                         json_response)
+from shared.db import (TimedDictCursor, commit_write, get_connection, get_read_connection, is_replica_connection,
+                       release_connection)
+from shared.phones import PHONE_NUMBER_LENGTH, normalize_phone
+from shared.presence import presence_buffer, presence_entry
+from shared.sessions import resolve_session, revoke_session, session_cache
+from shared.timing import annotate, phase
+
+SEND_CODE_WINDOW_SECONDS = int(os.environ.get('SEND_CODE_WINDOW_SECONDS', '3600'))
+SEND_CODE_PHONE_LIMIT = int(os.environ.get('SEND_CODE_PHONE_LIMIT', '5'))
+SEND_CODE_IP_LIMIT = int(os.environ.get('SEND_CODE_IP_LIMIT', '20'))
+
+def throttled_response(retry_after: int) -> Dict[str, Any]:
+    response = json_response(429, {
+        'success': False,
+        'error': 'Too many codes requested, try again later',
+        'retry_after': retry_after
+    })
+    response['headers'] = dict(JSON_HEADERS, **{'Retry-After': str(retry_after)})
+    return response
+
+def send_code(conn: Any, event: Dict[str, Any], body_data: Dict[str, Any]) -> Dict[str, Any]:
+    raw_phone = body_data.get('phone_number')
+    phone_number = normalize_phone(raw_phone) if isinstance(raw_phone, str) else ''
+    
+    if not phone_number.lstrip('+') or len(phone_number) > PHONE_NUMBER_LENGTH:
+        return json_response(400, {'success': False, 'error': 'phone_number is required'})
+    
+    client_ip = get_client_ip(event)
+    code = ''.join(random.choices(string.digits, k=4))
+    expires_at = datetime.now() + timedelta(minutes=5)
+    window = timedelta(seconds=SEND_CODE_WINDOW_SECONDS)
+    
+    with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+        # Serializes concurrent requests for one IP and for one phone so none can pass the counts below;
+        # always IP first, then phone, so two requests never wait on each other's locks
+        if client_ip:
+            cur.execute("SELECT pg_advisory_xact_lock(hashtext('send_code_ip:' || %s))", (client_ip,))
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('send_code:' || %s))", (phone_number,))
+        cur.execute(
+            """WITH recent AS (
+                SELECT COUNT(*) FILTER (WHERE phone_number = %(phone)s) AS phone_count,
+                    MIN(created_at) FILTER (WHERE phone_number = %(phone)s) AS phone_oldest,
+                    COUNT(*) FILTER (WHERE requested_ip = %(ip)s) AS ip_count,
+                    MIN(created_at) FILTER (WHERE requested_ip = %(ip)s) AS ip_oldest
+                FROM verification_codes
+                WHERE (phone_number = %(phone)s OR requested_ip = %(ip)s) AND created_at > NOW() - %(window)s
+            ), code AS (
+                INSERT INTO verification_codes (phone_number, code, expires_at, requested_ip)
+                SELECT %(phone)s, %(code)s, %(expires_at)s, %(ip)s FROM recent
+                WHERE phone_count < %(phone_limit)s AND (%(ip)s::varchar IS NULL OR ip_count < %(ip_limit)s)
+                RETURNING id
+            )
+            SELECT (SELECT id FROM code) AS id, LOCALTIMESTAMP AS now, recent.* FROM recent""",
+            {'phone': phone_number, 'ip': client_ip, 'window': window, 'code': code, 'expires_at': expires_at,
+             'phone_limit': SEND_CODE_PHONE_LIMIT, 'ip_limit': SEND_CODE_IP_LIMIT}
+        )
+        result = cur.fetchone()
+        conn.commit()
+    
+    if result['id'] is None:
+        blocked = [oldest for count, oldest, limit in (
+            (result['phone_count'], result['phone_oldest'], SEND_CODE_PHONE_LIMIT),
+            (result['ip_count'], result['ip_oldest'], SEND_CODE_IP_LIMIT)
+        ) if oldest is not None and count >= limit]
+        annotate(throttled=True)
+        reopens = max(blocked) + window if blocked else result['now'] + window
+        return throttled_response(max(1, math.ceil((reopens - result['now']).total_seconds())))
+    
+    return json_response(200, {
+        'success': True,
+        'message': f'Код: {code}'
+    })
+
+def verify_code(conn: Any, event: Dict[str, Any], body_data: Dict[str, Any]) -> Dict[str, Any]:
+    raw_phone = body_data.get('phone_number')
+    phone_number = normalize_phone(raw_phone) if isinstance(raw_phone, str) else None
+    code = body_data.get('code')
+    
+    session_token = ''.join(random.choices(string.ascii_letters + string.digits, k=64))
+    expires_at = datetime.now() + timedelta(days=30)
+    
+    with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+        cur.execute(
+            """WITH code AS (
+                UPDATE verification_codes SET is_used = true
+                WHERE id = (
+                    SELECT id FROM verification_codes
+                    WHERE phone_number = %s AND code = %s AND expires_at > NOW() AND is_used = false
+                    ORDER BY created_at DESC LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                ) AND is_used = false
+                RETURNING phone_number
+            ), u AS (
+                INSERT INTO users (phone_number, username, is_online, last_seen)
+                SELECT phone_number, 'User_' || RIGHT(phone_number, 4), true, NOW() FROM code
+                ON CONFLICT (phone_number) DO UPDATE SET is_online = true, last_seen = NOW()
+                RETURNING id, phone_number, username, avatar_url, status
+            ), s AS (
+                INSERT INTO auth_sessions (user_id, session_token, expires_at)
+                SELECT id, %s, %s FROM u
+            )
+            SELECT * FROM u""",
+            (phone_number, code, session_token, expires_at)
+        )
+        user = cur.fetchone()
+        
+        if not user:
+            return json_response(400, {'success': False, 'error': 'Invalid or expired code'})
+        
+        commit_write(conn, session_token)
+        session_cache.put(session_token, user['id'], expires_at)
+    
+    return json_response(200, {
+        'success': True,
+        'session_token': session_token,
+        'user': {
+            'id': user['id'],
+            'phone_number': user['phone_number'],
+            'username': user['username'],
+            'avatar_url': user['avatar_url'],
+            'status': user['status']
+        }
+    })
+
+def logout(conn: Any, event: Dict[str, Any], body_data: Dict[str, Any]) -> Dict[str, Any]:
+    session_token = get_session_token(event)
+    
+    if session_token:
+        with conn.cursor() as cur:
+            revoke_session(cur, session_token)
+            commit_write(conn, session_token)
+    
+    return json_response(200, {'success': True})
+
+ACTIONS = {
+    'send_code': send_code,
+    'verify_code': verify_code,
+    'logout': logout
+}
+
+def get_current_user(conn: Any, session_token: str) -> Dict[str, Any]:
+    with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+        with phase('session'):
+            user_id = resolve_session(cur, session_token)
+        user = None
+        
+        if user_id is not None:
+            cur.execute("SELECT *, NOW()::timestamp AS now FROM users WHERE id = %s", (user_id,))
+            user = cur.fetchone()
+        
+        if user_id is not None and not user and is_replica_connection(conn):
+            primary = get_connection()
+            try:
+                with primary.cursor(cursor_factory=TimedDictCursor) as primary_cur:
+                    primary_cur.execute("SELECT *, NOW()::timestamp AS now FROM users WHERE id = %s", (user_id,))
+                    user = primary_cur.fetchone()
+            finally:
+                release_connection(primary)
+        
+        if not user:
+            return json_response(401, {'success': False, 'error': 'Invalid session'})
+        
+        presence = presence_entry(user['last_seen'], presence_buffer.pending([user['id']]).get(user['id']), user['now'])
+        
+        return json_response(200, {
+            'success': True,
+            'user': {
+                'id': user['id'],
+                'phone_number': user['phone_number'],
+                'username': user['username'],
+                'avatar_url': user['avatar_url'],
+                'status': user['status'],
+                'is_online': presence['is_online']
+            }
+        })
+
+def handle(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Business: User authentication - send verification code and login
+    Args: event with httpMethod GET or POST; OPTIONS and missing tokens are answered by index.py
+    Returns: HTTP response with session token or verification status
+    """
+    method: str = event.get('httpMethod', 'GET')
+    
+    with phase('connect'):
+        conn = get_read_connection(get_session_token(event), get_write_position(event)) if method == 'GET' else get_connection()
+    
+    try:
+        if method == 'POST':
+            body_data = json.loads(event.get('body', '{}'))
+            return dispatch_action(ACTIONS, body_data.get('action'), conn, event, body_data)
+        
+        return get_current_user(conn, get_session_token(event))
+    
+    finally:
+        release_connection(conn)
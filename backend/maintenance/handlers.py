@@ -0,0 +1,161 @@
+import hmac
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List
+
+from shared.core import INVALID_ACTION_RESPONSE, constant_response, get_header, json_response
+from shared.db import TimedDictCursor, get_connection, release_connection
+from shared.timing import annotate
+
+# Runs from a timer trigger on the maintenance function (daily is enough: partitions are created
+# PARTITION_MONTHS_AHEAD months ahead). If the timer lapses past that, new messages land in
+# messages_default and the next create_partitions run moves them into their monthly partitions.
+PARTITION_MONTHS_AHEAD = int(os.environ.get('MESSAGES_PARTITION_MONTHS_AHEAD', '3'))
+HOT_RETENTION_DAYS = int(os.environ.get('MESSAGES_HOT_RETENTION_DAYS', '180'))
+SWEEP_BATCH_SIZE = int(os.environ.get('SWEEP_BATCH_SIZE', '5000'))
+SWEEP_TIME_BUDGET = float(os.environ.get('SWEEP_TIME_BUDGET_SECONDS', '20'))
+SEND_CODE_WINDOW_SECONDS = int(os.environ.get('SEND_CODE_WINDOW_SECONDS', '3600'))
+CLIENT_ID_RETENTION_DAYS = int(os.environ.get('MESSAGE_CLIENT_ID_RETENTION_DAYS', '30'))
+TASKS = ('create_partitions', 'archive_partitions', 'expire_codes', 'expire_sessions', 'expire_client_ids')
+
+# Codes stay until they leave auth's send_code throttling window, which counts them
+SWEEPS = {
+    'expire_codes': """DELETE FROM verification_codes WHERE id IN (
+        SELECT id FROM verification_codes
+        WHERE created_at < NOW() - %(window)s AND (expires_at < NOW() OR is_used)
+        ORDER BY created_at
+        LIMIT %(batch)s
+        FOR UPDATE SKIP LOCKED
+    )""",
+    'expire_sessions': """DELETE FROM auth_sessions WHERE id IN (
+        SELECT id FROM auth_sessions
+        WHERE expires_at < NOW()
+        ORDER BY expires_at
+        LIMIT %(batch)s
+        FOR UPDATE SKIP LOCKED
+    )""",
+    # Idempotency keys only need to outlive a client's retries of the same send
+    'expire_client_ids': """DELETE FROM message_client_ids WHERE (sender_id, client_message_id) IN (
+        SELECT sender_id, client_message_id FROM message_client_ids
+        WHERE created_at < NOW() - %(client_id_retention)s
+        ORDER BY created_at
+        LIMIT %(batch)s
+        FOR UPDATE SKIP LOCKED
+    )"""
+}
+
+UNAUTHORIZED_RESPONSE = constant_response(401, {'error': 'Unauthorized'})
+
+def sweep(conn: Any, cur: Any, task: str) -> Dict[str, Any]:
+    """
+    Business: Delete expired rows in batches of SWEEP_BATCH_SIZE, committing after each so no lock is held long
+    Args: conn - connection, cur - its cursor, task - key of SWEEPS
+    Returns: rows deleted, batches run and whether the table was fully swept within SWEEP_TIME_BUDGET
+    """
+    started = time.monotonic()
+    params = {
+        'window': timedelta(seconds=SEND_CODE_WINDOW_SECONDS),
+        'client_id_retention': timedelta(days=CLIENT_ID_RETENTION_DAYS),
+        'batch': SWEEP_BATCH_SIZE
+    }
+    deleted = 0
+    batches = 0
+    complete = False
+    while time.monotonic() - started < SWEEP_TIME_BUDGET:
+        cur.execute(SWEEPS[task], params)
+        conn.commit()
+        deleted += cur.rowcount
+        batches += 1
+        if cur.rowcount < SWEEP_BATCH_SIZE:
+            complete = True
+            break
+    return {
+        'task': task,
+        'deleted': deleted,
+        'batches': batches,
+        'complete': complete,
+        'seconds': round(time.monotonic() - started, 3)
+    }
+
+def archive_legacy_months(conn: Any, cur: Any, cutoff: datetime) -> Dict[str, Any]:
+    """
+    Business: Archive pre-partitioning history from messages_legacy one month per transaction
+    Args: conn - connection, cur - its cursor, cutoff - months ending after it stay hot
+    Returns: months archived and whether messages_legacy has nothing left before the cutoff
+    """
+    started = time.monotonic()
+    months = []
+    complete = False
+    while time.monotonic() - started < SWEEP_TIME_BUDGET:
+        cur.execute("SELECT * FROM archive_legacy_messages_month(%s::timestamp)", (cutoff,))
+        row = cur.fetchone()
+        conn.commit()
+        if row is None:
+            complete = True
+            break
+        months.append({'name': row['partition_name'], 'blocks': row['blocks'], 'messages': row['messages']})
+    return {'months': months, 'complete': complete}
+
+def run_task(conn: Any, cur: Any, task: str) -> Dict[str, Any]:
+    """
+    Business: Run one maintenance task against the messages partitions or the auth tables
+    Args: conn - connection, cur - its open TimedDictCursor, task - one of TASKS
+    Returns: task summary for the response body
+    """
+    if task in SWEEPS:
+        return sweep(conn, cur, task)
+    
+    if task == 'create_partitions':
+        cur.execute("SELECT create_messages_partitions(%s) AS created", (PARTITION_MONTHS_AHEAD,))
+        return {'task': task, 'created': cur.fetchone()['created']}
+    
+    cutoff = datetime.now() - timedelta(days=HOT_RETENTION_DAYS)
+    legacy = archive_legacy_months(conn, cur, cutoff)
+    cur.execute("SELECT * FROM archive_messages_before(%s::timestamp)", (cutoff,))
+    archived = cur.fetchall()
+    return {
+        'task': task,
+        'cutoff': cutoff.isoformat(),
+        'legacy': legacy,
+        'partitions': [{'name': row['partition_name'], 'blocks': row['blocks']} for row in archived]
+    }
+
+def handle(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Business: Scheduled upkeep of partitioned message storage (new partitions ahead, old ones to the archive)
+              and of the auth tables (expired verification codes and sessions) and idempotency keys
+    Args: event from a timer trigger, or POST with body {action} and header X-Maintenance-Token;
+          OPTIONS is answered by index.py
+    Returns: HTTP response with per-task results
+    """
+    if 'httpMethod' not in event:
+        tasks: List[str] = list(TASKS)
+    else:
+        token = get_header(event, 'X-Maintenance-Token')
+        expected = os.environ.get('MAINTENANCE_TOKEN')
+        if not expected or not hmac.compare_digest(token or '', expected):
+            return UNAUTHORIZED_RESPONSE
+        
+        body_data = json.loads(event.get('body') or '{}')
+        action = body_data.get('action')
+        if action is None:
+            tasks = list(TASKS)
+        elif action in TASKS:
+            tasks = [action]
+        else:
+            return INVALID_ACTION_RESPONSE
+    
+    annotate(tasks=tasks)
+    conn = get_connection()
+    try:
+        results = []
+        with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+            for task in tasks:
+                results.append(run_task(conn, cur, task))
+                conn.commit()
+        
+        return json_response(200, {'success': True, 'results': results})
+    finally:
+        release_connection(conn)
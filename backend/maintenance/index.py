@@ -0,0 +1,23 @@
+import os
+import sys
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.core import Function, implementation_path
+
+function = Function(
+    'maintenance',
+    implementation_path(__file__),
+    methods=('POST',),
+    allow_headers='Content-Type, X-Maintenance-Token',
+    trigger=True
+)
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Business: Scheduled upkeep of message partitions, the archive and the auth tables
+    Args: event from a timer trigger, or POST with body {action} and header X-Maintenance-Token
+    Returns: HTTP response with per-task results
+    """
+    return function.handler(event, context)
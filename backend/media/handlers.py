@@ -0,0 +1,336 @@
+import base64
+import binascii
+import io
+import json
+import os
+import re
+import secrets
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from shared.core import (METHOD_NOT_ALLOWED_RESPONSE, constant_response, get_session_token, get_write_position,
+                         json_response)
+from shared.db import TimedDictCursor, commit_write, get_connection, get_read_connection, release_connection
+from shared.media_access import accessible_media
+from shared.media_store import is_sha256, media_store
+from shared.sessions import resolve_session
+from shared.timing import phase
+
+MEDIA_MAX_SIZE = int(os.environ.get('MEDIA_MAX_SIZE', str(100 * 1024 * 1024)))
+MEDIA_CHUNK_SIZE = int(os.environ.get('MEDIA_CHUNK_SIZE', str(512 * 1024)))
+MEDIA_MAX_RESPONSE_BYTES = int(os.environ.get('MEDIA_MAX_RESPONSE_BYTES', str(4 * 1024 * 1024)))
+UPLOAD_TTL_HOURS = 24
+THUMBNAIL_SIZE = 320
+SWEEP_INTERVAL_SECONDS = 300.0
+SWEEP_BATCH_SIZE = 100
+
+_last_sweep = 0.0
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+INVALID_SESSION_RESPONSE = constant_response(401, {'error': 'Invalid session'})
+
+def chunk_count(size: int, chunk_size: int) -> int:
+    return (size + chunk_size - 1) // chunk_size
+
+def expected_chunk_size(upload: Dict[str, Any], index: int) -> int:
+    if index < chunk_count(upload['size'], upload['chunk_size']) - 1:
+        return upload['chunk_size']
+    return upload['size'] - index * upload['chunk_size']
+
+def make_thumbnail(path: str) -> Optional[Tuple[bytes, int, int]]:
+    """
+    Business: Render a small JPEG preview of an uploaded image
+    Args: path - stored blob
+    Returns: (jpeg bytes, original width, original height), or None when Pillow is missing or the image is unreadable
+    """
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+            image.thumbnail((THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+            buffer = io.BytesIO()
+            image.convert('RGB').save(buffer, 'JPEG', quality=80)
+            return buffer.getvalue(), width, height
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Business: Resolve a single-range Range header against the blob size
+    Args: header - value of Range, size - total bytes
+    Returns: (start, end) inclusive; (0, size - 1) without a header; None when unsatisfiable
+    """
+    if not header:
+        return 0, size - 1
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or (not match.group(1) and not match.group(2)):
+        return None
+    if not match.group(1):
+        suffix = int(match.group(2))
+        return (max(size - suffix, 0), size - 1) if suffix > 0 else None
+    start = int(match.group(1))
+    end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+    return (start, end) if start <= end else None
+
+def sweep_expired_uploads(cur: Any) -> None:
+    global _last_sweep
+    now = time.monotonic()
+    if now - _last_sweep < SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep = now
+    cur.execute(
+        """DELETE FROM media_uploads
+        WHERE id IN (SELECT id FROM media_uploads WHERE expires_at < NOW() LIMIT %s)
+        RETURNING id""",
+        (SWEEP_BATCH_SIZE,)
+    )
+    for row in cur.fetchall():
+        media_store.discard_upload(row['id'])
+
+def read_chunk_body(event: Dict[str, Any]) -> Optional[bytes]:
+    """Chunk bytes arrive base64-encoded, either as a binary body the gateway encoded or as base64 text"""
+    try:
+        return base64.b64decode(event.get('body') or '', validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+def handle(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Business: Resumable chunked media uploads with SHA-256 dedupe, and ranged downloads
+    Args: event with httpMethod, headers with X-Session-Token (and Range for downloads);
+          POST {action: init|complete}, PUT ?upload_id&index with a base64 chunk body,
+          GET ?upload_id (upload status) or ?id=<sha256>[&thumbnail=1][&info=1];
+          OPTIONS and missing tokens are answered by index.py
+    Returns: HTTP response with upload state, media metadata or (partial) media bytes
+    """
+    method: str = event.get('httpMethod', 'GET')
+    session_token = get_session_token(event)
+    
+    with phase('connect'):
+        conn = get_read_connection(session_token, get_write_position(event)) if method == 'GET' else get_connection()
+    
+    try:
+        with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+            with phase('session'):
+                user_id = resolve_session(cur, session_token)
+            
+            if user_id is None:
+                return INVALID_SESSION_RESPONSE
+            
+            params = event.get('queryStringParameters') or {}
+            
+            if method == 'POST':
+                body_data = json.loads(event.get('body') or '{}')
+                action = body_data.get('action')
+                
+                if action == 'init':
+                    size = body_data.get('size')
+                    mime_type = body_data.get('mime_type')
+                    file_name = body_data.get('file_name')
+                    sha256 = body_data.get('sha256')
+                    
+                    if not isinstance(size, int) or not 0 < size <= MEDIA_MAX_SIZE:
+                        return json_response(400, {'error': f'size must be 1-{MEDIA_MAX_SIZE} bytes'})
+                    if not isinstance(mime_type, str) or not mime_type or len(mime_type) > 100:
+                        return json_response(400, {'error': 'mime_type is required'})
+                    if sha256 is not None and not is_sha256(sha256):
+                        return json_response(400, {'error': 'sha256 must be a lowercase hex digest'})
+                    
+                    sweep_expired_uploads(cur)
+                    
+                    # A claimed sha256 is only checked against the bytes at complete; dedupe happens there
+                    upload_id = secrets.token_urlsafe(24)
+                    cur.execute(
+                        """INSERT INTO media_uploads (id, user_id, file_name, mime_type, size, chunk_size, sha256, expires_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, NOW() + make_interval(hours => %s))""",
+                        (upload_id, user_id, (file_name or '')[:255] or None, mime_type, size,
+                         MEDIA_CHUNK_SIZE, sha256, UPLOAD_TTL_HOURS)
+                    )
+                    commit_write(conn, session_token)
+                    
+                    return json_response(200, {
+                        'success': True,
+                        'upload_id': upload_id,
+                        'chunk_size': MEDIA_CHUNK_SIZE,
+                        'chunk_count': chunk_count(size, MEDIA_CHUNK_SIZE)
+                    })
+                
+                elif action == 'complete':
+                    cur.execute(
+                        "SELECT * FROM media_uploads WHERE id = %s AND user_id = %s AND expires_at > NOW()",
+                        (body_data.get('upload_id'), user_id)
+                    )
+                    upload = cur.fetchone()
+                    
+                    if not upload:
+                        return json_response(404, {'error': 'Upload not found or expired'})
+                    
+                    count = chunk_count(upload['size'], upload['chunk_size'])
+                    received = media_store.chunk_sizes(upload['id'])
+                    missing = [i for i in range(count) if received.get(i) != expected_chunk_size(upload, i)]
+                    if missing:
+                        return json_response(409, {'error': 'Upload is incomplete', 'missing': missing})
+                    
+                    sha256, size, tmp_path = media_store.assemble(upload['id'], count)
+                    if upload['sha256'] and upload['sha256'] != sha256:
+                        os.unlink(tmp_path)
+                        return json_response(422, {'error': 'Content does not match the declared sha256'})
+                    
+                    created = media_store.store_blob(sha256, tmp_path)
+                    thumbnail = None
+                    if created and upload['mime_type'].startswith('image/'):
+                        thumbnail = make_thumbnail(media_store.blob_path(sha256))
+                        if thumbnail:
+                            media_store.write_thumbnail(sha256, thumbnail[0])
+                    
+                    cur.execute(
+                        """WITH blob AS (
+                            INSERT INTO media_blobs (sha256, size, mime_type, width, height, has_thumbnail, created_by)
+                            VALUES (%s, %s, %s, %s, %s, %s, %s)
+                            ON CONFLICT (sha256) DO NOTHING
+                        ), done AS (
+                            DELETE FROM media_uploads WHERE id = %s
+                        )
+                        INSERT INTO media_owners (sha256, user_id) VALUES (%s, %s)
+                        ON CONFLICT DO NOTHING""",
+                        (sha256, size, upload['mime_type'], thumbnail[1] if thumbnail else None,
+                         thumbnail[2] if thumbnail else None, thumbnail is not None, user_id, upload['id'],
+                         sha256, user_id)
+                    )
+                    commit_write(conn, session_token)
+                    media_store.discard_upload(upload['id'])
+                    
+                    return json_response(200, {
+                        'success': True,
+                        'deduplicated': not created,
+                        'media_id': sha256,
+                        'size': size,
+                        'mime_type': upload['mime_type']
+                    })
+                
+                return json_response(400, {'error': 'Invalid action'})
+            
+            elif method == 'PUT':
+                try:
+                    index = int(params.get('index'))
+                except (TypeError, ValueError):
+                    return json_response(400, {'error': 'index is required'})
+                
+                cur.execute(
+                    "SELECT * FROM media_uploads WHERE id = %s AND user_id = %s AND expires_at > NOW()",
+                    (params.get('upload_id'), user_id)
+                )
+                upload = cur.fetchone()
+                conn.commit()
+                
+                if not upload:
+                    return json_response(404, {'error': 'Upload not found or expired'})
+                if not 0 <= index < chunk_count(upload['size'], upload['chunk_size']):
+                    return json_response(400, {'error': 'index is out of range'})
+                
+                data = read_chunk_body(event)
+                if data is None or len(data) != expected_chunk_size(upload, index):
+                    return json_response(400, {'error': f'Chunk {index} must be {expected_chunk_size(upload, index)} bytes'})
+                
+                media_store.write_chunk(upload['id'], index, data)
+                
+                return json_response(200, {'success': True, 'index': index})
+            
+            elif method == 'GET':
+                if params.get('upload_id'):
+                    cur.execute(
+                        "SELECT * FROM media_uploads WHERE id = %s AND user_id = %s AND expires_at > NOW()",
+                        (params['upload_id'], user_id)
+                    )
+                    upload = cur.fetchone()
+                    
+                    if not upload:
+                        return json_response(404, {'error': 'Upload not found or expired'})
+                    
+                    received = media_store.chunk_sizes(upload['id'])
+                    count = chunk_count(upload['size'], upload['chunk_size'])
+                    
+                    return json_response(200, {
+                        'success': True,
+                        'upload_id': upload['id'],
+                        'chunk_size': upload['chunk_size'],
+                        'chunk_count': count,
+                        'received': [i for i in range(count) if received.get(i) == expected_chunk_size(upload, i)]
+                    })
+                
+                media_id = params.get('id')
+                if not is_sha256(media_id):
+                    return json_response(400, {'error': 'id must be a media sha256'})
+                
+                cur.execute("SELECT * FROM media_blobs WHERE sha256 = %s", (media_id,))
+                blob = cur.fetchone()
+                thumbnail = params.get('thumbnail') in ('1', 'true')
+                
+                if blob and not accessible_media(cur, user_id, [media_id]):
+                    blob = None
+                
+                if not blob or (thumbnail and not blob['has_thumbnail']):
+                    return json_response(404, {'error': 'Media not found'})
+                
+                if params.get('info') in ('1', 'true'):
+                    return json_response(200, {
+                        'success': True,
+                        'media': {
+                            'id': blob['sha256'],
+                            'size': blob['size'],
+                            'mime_type': blob['mime_type'],
+                            'width': blob['width'],
+                            'height': blob['height'],
+                            'has_thumbnail': blob['has_thumbnail']
+                        }
+                    })
+                
+                size = media_store.size(media_id, thumbnail)
+                if size is None:
+                    return json_response(404, {'error': 'Media not found'})
+                
+                headers = event.get('headers') or {}
+                etag = f'"{media_id}-thumb"' if thumbnail else f'"{media_id}"'
+                base_headers = {
+                    'Content-Type': 'image/jpeg' if thumbnail else blob['mime_type'],
+                    'Access-Control-Allow-Origin': '*',
+                    'Access-Control-Expose-Headers': 'Content-Range, Accept-Ranges, ETag',
+                    'Accept-Ranges': 'bytes',
+                    'ETag': etag,
+                    'Cache-Control': 'private, max-age=31536000, immutable'
+                }
+                
+                if (headers.get('if-none-match') or headers.get('If-None-Match')) == etag:
+                    return {'statusCode': 304, 'headers': base_headers, 'body': '', 'isBase64Encoded': False}
+                
+                range_header = headers.get('range') or headers.get('Range')
+                byte_range = parse_range(range_header, size)
+                if byte_range is None:
+                    return {
+                        'statusCode': 416,
+                        'headers': dict(base_headers, **{'Content-Range': f'bytes */{size}'}),
+                        'body': '',
+                        'isBase64Encoded': False
+                    }
+                
+                start, end = byte_range
+                end = min(end, start + MEDIA_MAX_RESPONSE_BYTES - 1)
+                partial = range_header is not None or end < size - 1
+                response_headers = dict(base_headers)
+                if partial:
+                    response_headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+                
+                return {
+                    'statusCode': 206 if partial else 200,
+                    'headers': response_headers,
+                    'body': base64.b64encode(media_store.read_range(media_id, start, end, thumbnail)).decode('ascii'),
+                    'isBase64Encoded': True
+                }
+        
+        return METHOD_NOT_ALLOWED_RESPONSE
+    finally:
+        release_connection(conn)
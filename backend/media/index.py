@@ -0,0 +1,23 @@
+import os
+import sys
+from typing import Dict, Any
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from shared.core import Function, implementation_path
+
+function = Function(
+    'media',
+    implementation_path(__file__),
+    methods=('GET', 'POST', 'PUT'),
+    allow_headers='Content-Type, X-Session-Token, X-Write-LSN, Range, If-None-Match',
+    session_methods=('GET', 'POST', 'PUT')
+)
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Business: Resumable chunked media uploads and ranged downloads
+    Args: event with httpMethod, body, headers with X-Session-Token (and Range for downloads)
+    Returns: HTTP response with upload state, media metadata or (partial) media bytes
+    """
+    return function.handler(event, context)
@@ -0,0 +1,976 @@
+import json
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+import psycopg2.errors
+
+from shared.core import (constant_response, dispatch_action, etag_matches, get_session_token, get_write_position,
+                         json_response, make_etag, not_modified, with_etag)
+from shared.db import (TimedDictCursor, commit_write, get_connection, get_read_connection, is_replica_connection,
+                       release_connection)
+from shared.sessions import resolve_session
+from shared.cursors import InvalidCursor, decode_cursor, encode_cursor, parse_limit
+from shared.media_access import accessible_media
+from shared.media_store import is_sha256
+from shared.membership import is_chat_member, member_cache
+from shared.notify import wait_for_notify
+from shared.phones import PHONE_NUMBER_LENGTH, normalize_phone, phone_hash
+from shared.presence import PRESENCE_ONLINE_TTL, flush_presence, get_presence, record_heartbeat
+from shared.statements import execute_prepared, register_statement
+from shared.timing import phase
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+MAX_MESSAGE_ID = 2147483647
+DELTA_PAGE_SIZE = 500
+PREVIEW_LENGTH = 200
+MAX_BATCH_SIZE = 500
+MESSAGE_TYPES = ('text', 'image', 'file', 'voice')
+MAX_CONTACTS = 5000
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE_SIZE = 100
+HEADLINE_OPTIONS = 'StartSel=<mark>, StopSel=</mark>, MaxWords=20, MinWords=5, MaxFragments=2'
+PARTITION_PRUNE_SLACK = '1 hour'
+MAX_PRESENCE_IDS = 500
+MAX_GROUP_MEMBERS = 5000
+GROUP_NAME_LENGTH = 200
+MAX_SYNC_WAIT = 25
+
+INVALID_SESSION_RESPONSE = constant_response(401, {'error': 'Invalid session'})
+NOT_PARTICIPANT_RESPONSE = constant_response(403, {'error': 'Not a participant of this chat'})
+NOT_GROUP_ADMIN_RESPONSE = constant_response(403, {'error': 'Only group admins can do this'})
+UNKNOWN_MEDIA_RESPONSE = constant_response(400, {'error': 'Unknown media_id; finish the upload first'})
+
+READ_MARKS_CTE = """WITH w AS (
+    SELECT COALESCE(bool_or(user_id = %s), false) AS is_member,
+        COALESCE(MAX(last_read_message_id) FILTER (WHERE user_id != %s), 0) AS peer_read,
+        COALESCE(MAX(last_read_message_id) FILTER (WHERE user_id = %s), 0) AS my_read
+    FROM chat_participants WHERE chat_id = %s
+)"""
+
+SEND_MESSAGE = register_statement(
+    'messages_send',
+    """WITH m AS (
+        INSERT INTO messages (chat_id, sender_id, content, type, media_sha256)
+        VALUES ($1, $2, $3, $4, $6)
+        RETURNING id, chat_id, sender_id, content, type, created_at, media_sha256
+    ), media AS (
+        INSERT INTO chat_media (sha256, chat_id)
+        SELECT media_sha256, chat_id FROM m WHERE media_sha256 IS NOT NULL
+        ON CONFLICT DO NOTHING
+    ), summary AS (
+        UPDATE chats c
+        SET updated_at = NOW(), last_message_id = m.id, message_count = c.message_count + 1,
+            last_message_preview = LEFT(m.content, $5), last_message_at = m.created_at
+        FROM m WHERE c.id = m.chat_id
+        RETURNING c.type, c.message_count
+    ), unread AS (
+        UPDATE chat_participants cp SET unread_count = cp.unread_count + 1
+        FROM m, summary s WHERE s.type = 'private' AND cp.chat_id = m.chat_id AND cp.user_id != m.sender_id
+    ), own AS (
+        UPDATE chat_participants cp SET last_read_message_id = m.id, read_count = s.message_count
+        FROM m, summary s WHERE s.type = 'group' AND cp.chat_id = m.chat_id AND cp.user_id = m.sender_id
+    )
+    SELECT m.*, pg_notify('chat_messages_' || m.chat_id, m.id::text) FROM m"""
+)
+
+CHAT_LIST = register_statement(
+    'messages_chat_list',
+    """SELECT c.id, c.type, c.name, c.avatar_url,
+    CASE WHEN c.type = 'group' THEN GREATEST(c.message_count - cp.read_count, 0) ELSE cp.unread_count END AS unread_count,
+    c.last_message_preview as last_message, c.last_message_at as last_message_time,
+    CASE WHEN c.type = 'private' THEN c.pair_user_low + c.pair_user_high - $1 END AS peer_id
+    FROM chat_participants cp
+    JOIN chats c ON c.id = cp.chat_id
+    WHERE cp.user_id = $1
+    ORDER BY c.updated_at DESC"""
+)
+
+def message_to_dict(msg: Dict[str, Any], user_id: int) -> Dict[str, Any]:
+    read_up_to = msg['peer_read'] if msg['sender_id'] == user_id else msg['my_read']
+    return {
+        'id': msg['id'],
+        'chat_id': msg['chat_id'],
+        'sender_id': msg['sender_id'],
+        'content': msg['content'],
+        'type': msg['type'],
+        'is_read': msg['id'] <= read_up_to,
+        'created_at': msg['created_at'].isoformat(),
+        'media_id': msg.get('media_sha256'),
+        'sender': {
+            'username': msg['username'],
+            'avatar_url': msg['avatar_url']
+        }
+    }
+
+def parse_batch_messages(raw: Any) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Business: Validate the 'messages' list of a send_batch request and drop repeated idempotency keys
+    Args: raw - value of body['messages']
+    Returns: (items, error); items keep request order, error is None when the batch is valid
+    """
+    if not isinstance(raw, list) or not raw:
+        return [], 'messages must be a non-empty list'
+    if len(raw) > MAX_BATCH_SIZE:
+        return [], f'At most {MAX_BATCH_SIZE} messages per batch'
+    
+    items = []
+    seen = set()
+    for entry in raw:
+        if not isinstance(entry, dict):
+            return [], 'Each message must be an object'
+        client_id = entry.get('client_id')
+        message_type = entry.get('type', 'text')
+        if not isinstance(client_id, str) or not client_id or len(client_id) > 64:
+            return [], 'Each message needs a client_id of 1-64 characters'
+        if not isinstance(entry.get('chat_id'), int) or not isinstance(entry.get('content'), str):
+            return [], 'Each message needs an integer chat_id and string content'
+        if message_type not in MESSAGE_TYPES:
+            return [], f'Unsupported message type: {message_type}'
+        if entry.get('media_id') is not None and not is_sha256(entry['media_id']):
+            return [], 'media_id must be the SHA-256 returned by the media upload'
+        if client_id in seen:
+            continue
+        seen.add(client_id)
+        items.append({
+            'chat_id': entry['chat_id'],
+            'content': entry['content'],
+            'type': message_type,
+            'client_id': client_id,
+            'media_id': entry.get('media_id')
+        })
+    return items, None
+
+def encode_sync_token(after_id: int, after_at: Optional[datetime]) -> str:
+    token = {'after_id': after_id}
+    if after_at is not None:
+        token['after_at'] = after_at.isoformat()
+    return encode_cursor(token)
+
+def fetch_archived_messages(cur: Any, chat_id: int, before_id: int, limit: int) -> List[Dict[str, Any]]:
+    """
+    Business: Continue a history page from messages_archive once the live partitions run out
+    Args: cur - open RealDictCursor, chat_id - chat being paged, before_id - exclusive upper id, limit - rows wanted
+    Returns: archived messages newest first, shaped like rows of the live history query
+    """
+    # A block is read only while the blocks newer than it hold fewer than limit rows below before_id;
+    # the one block straddling before_id counts just its older rows, so short monthly blocks after it
+    # are still reached
+    cur.execute(
+        """WITH candidates AS (
+            SELECT a.payload, a.last_id,
+                CASE WHEN a.last_id < %s THEN a.message_count
+                    ELSE (SELECT COUNT(*) FROM jsonb_array_elements(a.payload) e WHERE (e->>'id')::bigint < %s)
+                END AS older
+            FROM messages_archive a
+            WHERE a.chat_id = %s AND a.first_id < %s
+        ), blocks AS (
+            SELECT payload,
+                COALESCE(SUM(older) OVER (
+                    ORDER BY last_id DESC ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+                ), 0) AS skipped
+            FROM candidates
+        )
+        SELECT r.id, %s AS chat_id, r.sender_id, r.content, r.type, r.created_at, r.media_sha256,
+            u.username, u.avatar_url
+        FROM blocks b
+        CROSS JOIN LATERAL jsonb_to_recordset(b.payload)
+            AS r(id INTEGER, sender_id INTEGER, content TEXT, type VARCHAR(20), created_at TIMESTAMP, media_sha256 CHAR(64))
+        JOIN users u ON u.id = r.sender_id
+        WHERE b.skipped < %s AND r.id < %s
+        ORDER BY r.id DESC
+        LIMIT %s""",
+        (before_id, before_id, chat_id, before_id, chat_id, limit, before_id, limit)
+    )
+    return [dict(row) for row in cur.fetchall()]
+
+def parse_member_ids(raw: Any, max_count: int) -> Tuple[List[int], Optional[str]]:
+    """
+    Business: Validate the member_ids list of a group request
+    Args: raw - value of body['member_ids'], max_count - members that may still be added
+    Returns: (sorted unique user ids, error); error is None when the list is valid
+    """
+    if raw is None:
+        return [], None
+    if not isinstance(raw, list) or not all(isinstance(member_id, int) for member_id in raw):
+        return [], 'member_ids must be a list of user ids'
+    member_ids = sorted(set(raw))
+    if len(member_ids) > max_count:
+        return [], f'A group can have at most {MAX_GROUP_MEMBERS} members'
+    return member_ids, None
+
+def collect_phone_hashes(numbers: Any, hashes: Any) -> Tuple[List[str], Optional[str]]:
+    """
+    Business: Turn a contact-sync payload into SHA-256 phone hashes matching users.phone_hash
+    Args: numbers - list of phone numbers (normalized here), hashes - list of hex SHA-256 digests
+    Returns: (unique hashes, error); error is None when the payload is valid
+    """
+    numbers = numbers or []
+    hashes = hashes or []
+    if not isinstance(numbers, list) or not isinstance(hashes, list):
+        return [], 'Phone numbers and hashes must be lists'
+    if len(numbers) + len(hashes) > MAX_CONTACTS:
+        return [], f'At most {MAX_CONTACTS} contacts per request'
+    
+    result = set()
+    for number in numbers:
+        if not isinstance(number, str):
+            return [], 'Phone numbers must be strings'
+        result.add(phone_hash(number))
+    for digest in hashes:
+        if not isinstance(digest, str) or len(digest) != 64:
+            return [], 'Phone hashes must be hex SHA-256 digests'
+        result.add(digest.lower())
+    return sorted(result), None
+
+def send_message(conn: Any, cur: Any, user_id: int, session_token: str, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    chat_id = body_data.get('chat_id')
+    content = body_data.get('content')
+    message_type = body_data.get('type', 'text')
+    media_id = body_data.get('media_id')
+    
+    if media_id is not None and not is_sha256(media_id):
+        return UNKNOWN_MEDIA_RESPONSE
+    
+    if not isinstance(chat_id, int) or not is_chat_member(cur, chat_id, user_id):
+        return NOT_PARTICIPANT_RESPONSE
+    
+    if media_id is not None and not accessible_media(cur, user_id, [media_id]):
+        return UNKNOWN_MEDIA_RESPONSE
+    
+    try:
+        execute_prepared(
+            cur, SEND_MESSAGE, (chat_id, user_id, content, message_type, PREVIEW_LENGTH, media_id)
+        )
+    except psycopg2.errors.ForeignKeyViolation as e:
+        if e.diag.constraint_name != 'messages_media_sha256_fkey':
+            raise
+        conn.rollback()
+        return UNKNOWN_MEDIA_RESPONSE
+    message = cur.fetchone()
+    
+    commit_write(conn, session_token)
+    
+    return json_response(200, {
+        'success': True,
+        'message': {
+            'id': message['id'],
+            'chat_id': message['chat_id'],
+            'sender_id': message['sender_id'],
+            'content': message['content'],
+            'type': message['type'],
+            'created_at': message['created_at'].isoformat(),
+            'media_id': message['media_sha256']
+        }
+    })
+
+def send_batch(conn: Any, cur: Any, user_id: int, session_token: str, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    items, error = parse_batch_messages(body_data.get('messages'))
+    
+    if error:
+        return json_response(400, {'error': error})
+    
+    chat_ids = sorted({item['chat_id'] for item in items})
+    if not all(is_chat_member(cur, batch_chat_id, user_id) for batch_chat_id in chat_ids):
+        return json_response(403, {'error': 'Not a participant of every chat in the batch'})
+    
+    media_ids = {item['media_id'] for item in items if item['media_id']}
+    if media_ids and accessible_media(cur, user_id, media_ids) != media_ids:
+        return UNKNOWN_MEDIA_RESPONSE
+    
+    try:
+        cur.execute(
+            """WITH input AS (
+                SELECT * FROM unnest(%s::integer[], %s::text[], %s::varchar[], %s::varchar[], %s::char(64)[])
+                    WITH ORDINALITY AS i(chat_id, content, type, client_message_id, media_sha256, ord)
+            ), keys AS (
+                INSERT INTO message_client_ids (sender_id, client_message_id, message_id, chat_id, created_at)
+                SELECT %s, client_message_id, nextval('messages_id_seq'), chat_id, NOW() FROM input ORDER BY ord
+                ON CONFLICT (sender_id, client_message_id) DO NOTHING
+                RETURNING client_message_id, message_id, created_at
+            ), m AS (
+                INSERT INTO messages (id, chat_id, sender_id, content, type, created_at, media_sha256)
+                SELECT keys.message_id, input.chat_id, %s, input.content, input.type, keys.created_at,
+                    input.media_sha256
+                FROM input JOIN keys USING (client_message_id)
+                RETURNING id, chat_id, sender_id, content, type, created_at, media_sha256
+            ), media AS (
+                INSERT INTO chat_media (sha256, chat_id)
+                SELECT DISTINCT media_sha256, chat_id FROM m WHERE media_sha256 IS NOT NULL
+                ON CONFLICT DO NOTHING
+            ), last AS (
+                SELECT DISTINCT ON (chat_id) id, chat_id, content, created_at
+                FROM m ORDER BY chat_id, id DESC
+            ), counts AS (
+                SELECT chat_id, COUNT(*) AS n FROM m GROUP BY chat_id
+            ), summary AS (
+                UPDATE chats c
+                SET updated_at = NOW(), last_message_id = last.id, message_count = c.message_count + counts.n,
+                    last_message_preview = LEFT(last.content, %s), last_message_at = last.created_at
+                FROM last JOIN counts USING (chat_id) WHERE c.id = last.chat_id
+                RETURNING c.id, c.type, c.message_count, last.id AS last_id
+            ), unread AS (
+                UPDATE chat_participants cp SET unread_count = cp.unread_count + counts.n
+                FROM counts JOIN summary s ON s.id = counts.chat_id
+                WHERE s.type = 'private' AND cp.chat_id = counts.chat_id AND cp.user_id != %s
+            ), own AS (
+                UPDATE chat_participants cp SET last_read_message_id = s.last_id, read_count = s.message_count
+                FROM summary s WHERE s.type = 'group' AND cp.chat_id = s.id AND cp.user_id = %s
+            )
+            SELECT m.*, keys.client_message_id FROM m JOIN keys ON keys.message_id = m.id""",
+            (
+                [item['chat_id'] for item in items],
+                [item['content'] for item in items],
+                [item['type'] for item in items],
+                [item['client_id'] for item in items],
+                [item['media_id'] for item in items],
+                user_id, user_id, PREVIEW_LENGTH, user_id, user_id
+            )
+        )
+    except psycopg2.errors.ForeignKeyViolation as e:
+        if e.diag.constraint_name != 'messages_media_sha256_fkey':
+            raise
+        conn.rollback()
+        return UNKNOWN_MEDIA_RESPONSE
+    
+    created = {row['client_message_id']: row for row in cur.fetchall()}
+    
+    # Notify in a statement of its own, after the insert, once per chat with its newest message id
+    last_ids = {}
+    for row in created.values():
+        last_ids[row['chat_id']] = max(row['id'], last_ids.get(row['chat_id'], 0))
+    if last_ids:
+        cur.execute(
+            """SELECT pg_notify('chat_messages_' || chat_id, last_id::text)
+            FROM unnest(%s::integer[], %s::bigint[]) AS n(chat_id, last_id)""",
+            (list(last_ids), list(last_ids.values()))
+        )
+    
+    duplicate_keys = [item['client_id'] for item in items if item['client_id'] not in created]
+    existing = {}
+    if duplicate_keys:
+        cur.execute(
+            """SELECT message_id AS id, chat_id, %s AS sender_id, created_at, client_message_id
+            FROM message_client_ids WHERE sender_id = %s AND client_message_id = ANY(%s)""",
+            (user_id, user_id, duplicate_keys)
+        )
+        existing = {row['client_message_id']: row for row in cur.fetchall()}
+    
+    commit_write(conn, session_token)
+    
+    results = []
+    for item in items:
+        row = created.get(item['client_id']) or existing.get(item['client_id'])
+        results.append({
+            'client_id': item['client_id'],
+            'id': row['id'] if row else None,
+            'chat_id': row['chat_id'] if row else item['chat_id'],
+            'created_at': row['created_at'].isoformat() if row else None,
+            'duplicate': item['client_id'] not in created
+        })
+    
+    return json_response(200, {
+        'success': True,
+        'created': len(created),
+        'messages': results
+    })
+
+def mark_read(conn: Any, cur: Any, user_id: int, session_token: str, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    chat_id = body_data.get('chat_id')
+    message_id = body_data.get('message_id')
+    
+    if not isinstance(chat_id, int) or isinstance(chat_id, bool):
+        return json_response(400, {'error': 'chat_id must be an integer'})
+    if message_id is not None and (not isinstance(message_id, int) or isinstance(message_id, bool)):
+        return json_response(400, {'error': 'message_id must be an integer'})
+    
+    cur.execute(
+        """UPDATE chat_participants cp
+        SET last_read_message_id = r.read_up_to,
+            read_at = NOW(),
+            unread_count = CASE WHEN r.type = 'group' OR r.read_up_to >= COALESCE(r.last_message_id, 0) THEN 0 ELSE (
+                SELECT COUNT(*) FROM messages m
+                WHERE m.chat_id = cp.chat_id AND m.id > r.read_up_to AND m.sender_id != cp.user_id
+            ) END,
+            read_count = CASE
+                WHEN r.type != 'group' THEN cp.read_count
+                WHEN r.read_up_to >= COALESCE(r.last_message_id, 0) THEN r.message_count
+                ELSE r.message_count - (
+                    SELECT COUNT(*) FROM messages m WHERE m.chat_id = cp.chat_id AND m.id > r.read_up_to
+                )
+            END
+        FROM (
+            SELECT GREATEST(p.last_read_message_id, LEAST(COALESCE(%s, c.last_message_id, 0), COALESCE(c.last_message_id, 0))) AS read_up_to,
+                c.last_message_id, c.message_count, c.type
+            FROM chat_participants p
+            JOIN chats c ON c.id = p.chat_id
+            WHERE p.chat_id = %s AND p.user_id = %s
+        ) r
+        WHERE cp.chat_id = %s AND cp.user_id = %s
+        RETURNING cp.last_read_message_id,
+            CASE WHEN r.type = 'group' THEN GREATEST(r.message_count - cp.read_count, 0)
+                ELSE cp.unread_count END AS unread_count""",
+        (message_id, chat_id, user_id, chat_id, user_id)
+    )
+    marker = cur.fetchone()
+    
+    if not marker:
+        return NOT_PARTICIPANT_RESPONSE
+    
+    commit_write(conn, session_token)
+    
+    return json_response(200, {
+        'success': True,
+        'last_read_message_id': marker['last_read_message_id'],
+        'unread_count': marker['unread_count']
+    })
+
+def sync_contacts(conn: Any, cur: Any, user_id: int, session_token: str, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    added, error = collect_phone_hashes(body_data.get('phone_numbers'), body_data.get('phone_hashes'))
+    if not error:
+        removed, error = collect_phone_hashes(body_data.get('removed_numbers'), body_data.get('removed_hashes'))
+    
+    if error:
+        return json_response(400, {'error': error})
+    
+    full_sync = bool(body_data.get('full'))
+    removed = sorted(set(removed) - set(added))
+    
+    cur.execute(
+        """WITH input AS (
+            SELECT DISTINCT unnest(%s::varchar[]) AS phone_hash
+        ), removed AS (
+            DELETE FROM user_contacts
+            WHERE owner_id = %s
+            AND ((%s AND phone_hash != ALL(%s::varchar[])) OR phone_hash = ANY(%s::varchar[]))
+        ), added AS (
+            INSERT INTO user_contacts (owner_id, phone_hash)
+            SELECT %s, phone_hash FROM input
+            ON CONFLICT DO NOTHING
+        )
+        SELECT u.id, u.phone_number, u.phone_hash, u.username, u.avatar_url
+        FROM input
+        JOIN users u ON u.phone_hash = input.phone_hash
+        WHERE u.id != %s""",
+        (added, user_id, full_sync, added, removed, user_id, user_id)
+    )
+    matches = cur.fetchall()
+    
+    commit_write(conn, session_token)
+    
+    return json_response(200, {
+        'success': True,
+        'matches': [{
+            'user_id': match['id'],
+            'phone_number': match['phone_number'],
+            'phone_hash': match['phone_hash'],
+            'username': match['username'],
+            'avatar_url': match['avatar_url']
+        } for match in matches],
+        'removed': len(removed)
+    })
+
+def heartbeat(conn: Any, cur: Any, user_id: int, session_token: str, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    return json_response(200, {'success': True, 'online_ttl': PRESENCE_ONLINE_TTL})
+
+def create_chat(conn: Any, cur: Any, user_id: int, session_token: str, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    raw_phone = body_data.get('participant_phone')
+    participant_phone = normalize_phone(raw_phone) if isinstance(raw_phone, str) else ''
+    
+    if not participant_phone.lstrip('+') or len(participant_phone) > PHONE_NUMBER_LENGTH:
+        return json_response(400, {'error': 'participant_phone is required'})
+    
+    cur.execute(
+        """SELECT u.id, c.id AS chat_id FROM users u
+        LEFT JOIN chats c ON c.type = 'private'
+            AND c.pair_user_low = LEAST(u.id, %s) AND c.pair_user_high = GREATEST(u.id, %s)
+        WHERE u.phone_number = %s""",
+        (user_id, user_id, participant_phone)
+    )
+    participant = cur.fetchone()
+    
+    if not participant:
+        return json_response(404, {'error': 'User not found'})
+    
+    if participant['chat_id']:
+        return json_response(200, {
+            'success': True,
+            'chat_id': participant['chat_id']
+        })
+    
+    cur.execute(
+        """WITH c AS (
+            INSERT INTO chats (type, pair_user_low, pair_user_high)
+            VALUES ('private', LEAST(%s, %s), GREATEST(%s, %s))
+            ON CONFLICT (pair_user_low, pair_user_high) WHERE type = 'private'
+            DO UPDATE SET pair_user_low = EXCLUDED.pair_user_low
+            RETURNING id
+        ), p AS (
+            INSERT INTO chat_participants (chat_id, user_id)
+            SELECT c.id, member FROM c, unnest(ARRAY[%s, %s]) AS member
+            ON CONFLICT (chat_id, user_id) DO NOTHING
+        )
+        SELECT id FROM c""",
+        (user_id, participant['id'], user_id, participant['id'], user_id, participant['id'])
+    )
+    chat = cur.fetchone()
+    
+    commit_write(conn, session_token)
+    
+    return json_response(200, {
+        'success': True,
+        'chat_id': chat['id']
+    })
+
+def create_group(conn: Any, cur: Any, user_id: int, session_token: str, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    name = body_data.get('name')
+    member_ids, error = parse_member_ids(body_data.get('member_ids'), MAX_GROUP_MEMBERS - 1)
+    
+    if not error and (not isinstance(name, str) or not name.strip() or len(name) > GROUP_NAME_LENGTH):
+        error = f'name must be 1-{GROUP_NAME_LENGTH} characters'
+    if error:
+        return json_response(400, {'error': error})
+    
+    cur.execute(
+        """WITH c AS (
+            INSERT INTO chats (type, name, created_by) VALUES ('group', %s, %s)
+            RETURNING id
+        ), p AS (
+            INSERT INTO chat_participants (chat_id, user_id, is_admin)
+            SELECT c.id, u.id, u.id = %s FROM c, users u
+            WHERE u.id = ANY(%s)
+            ORDER BY u.id
+            RETURNING user_id
+        )
+        SELECT c.id, ARRAY(SELECT user_id FROM p ORDER BY user_id) AS member_ids FROM c""",
+        (name.strip(), user_id, user_id, sorted(set(member_ids) | {user_id}))
+    )
+    chat = cur.fetchone()
+    
+    commit_write(conn, session_token)
+    member_cache.put(chat['id'], frozenset(chat['member_ids']))
+    
+    return json_response(200, {
+        'success': True,
+        'chat_id': chat['id'],
+        'member_ids': chat['member_ids']
+    })
+
+def change_members(conn: Any, cur: Any, user_id: int, session_token: str, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    action = body_data.get('action')
+    
+    chat_id = body_data.get('chat_id')
+    
+    cur.execute(
+        """SELECT c.type, cp.is_admin,
+            (SELECT COUNT(*) FROM chat_participants WHERE chat_id = c.id) AS member_count
+        FROM chats c
+        JOIN chat_participants cp ON cp.chat_id = c.id AND cp.user_id = %s
+        WHERE c.id = %s""",
+        (user_id, chat_id if isinstance(chat_id, int) else None)
+    )
+    membership = cur.fetchone()
+    
+    if not membership:
+        return NOT_PARTICIPANT_RESPONSE
+    
+    if membership['type'] != 'group':
+        return json_response(400, {'error': 'Members can only be changed in group chats'})
+    
+    if action == 'add_members':
+        member_ids, error = parse_member_ids(
+            body_data.get('member_ids'), MAX_GROUP_MEMBERS - membership['member_count']
+        )
+        if not membership['is_admin']:
+            return NOT_GROUP_ADMIN_RESPONSE
+        if error or not member_ids:
+            return json_response(400, {'error': error or 'member_ids must not be empty'})
+        
+        cur.execute(
+            """INSERT INTO chat_participants (chat_id, user_id, last_read_message_id, read_count)
+            SELECT c.id, u.id, COALESCE(c.last_message_id, 0), c.message_count
+            FROM chats c, users u
+            WHERE c.id = %s AND u.id = ANY(%s)
+            ORDER BY u.id
+            ON CONFLICT (chat_id, user_id) DO NOTHING
+            RETURNING user_id""",
+            (chat_id, member_ids)
+        )
+        changed = sorted(row['user_id'] for row in cur.fetchall())
+    else:
+        target_id = body_data.get('user_id', user_id)
+        if target_id != user_id and not membership['is_admin']:
+            return NOT_GROUP_ADMIN_RESPONSE
+        
+        cur.execute(
+            "DELETE FROM chat_participants WHERE chat_id = %s AND user_id = %s RETURNING user_id",
+            (chat_id, target_id if isinstance(target_id, int) else None)
+        )
+        changed = [row['user_id'] for row in cur.fetchall()]
+    
+    commit_write(conn, session_token)
+    member_cache.invalidate(chat_id)
+    
+    return json_response(200, {
+        'success': True,
+        'chat_id': chat_id,
+        'added' if action == 'add_members' else 'removed': changed
+    })
+
+def read_presence(conn: Any, cur: Any, user_id: int, params: Dict[str, str]) -> Dict[str, Any]:
+    try:
+        presence_ids = sorted({int(value) for value in params['presence'].split(',') if value.strip()})
+    except ValueError:
+        presence_ids = None
+    if not presence_ids or len(presence_ids) > MAX_PRESENCE_IDS:
+        return json_response(400, {'error': f'presence takes 1-{MAX_PRESENCE_IDS} comma-separated user ids'})
+    
+    presence = get_presence(cur, presence_ids)
+    
+    return json_response(200, {
+        'success': True,
+        'online_ttl': PRESENCE_ONLINE_TTL,
+        'presence': {str(uid): status for uid, status in presence.items()}
+    })
+
+def search_messages(conn: Any, cur: Any, user_id: int, params: Dict[str, str]) -> Dict[str, Any]:
+    chat_id = params.get('chat_id')
+    
+    try:
+        limit = parse_limit(params.get('limit'), SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE)
+        cursor = decode_cursor(params.get('cursor'))
+        after_rank = float(cursor['rank']) if cursor else float('inf')
+        after_id = int(cursor['id']) if cursor else MAX_MESSAGE_ID
+        search_chat_id = int(chat_id) if chat_id else None
+    except (InvalidCursor, KeyError, TypeError, ValueError):
+        return json_response(400, {'error': 'Invalid search parameters'})
+    
+    chat_filter = 'AND m.chat_id = %s' if search_chat_id is not None else ''
+    chat_args = (search_chat_id,) if search_chat_id is not None else ()
+    cur.execute(
+        f"""WITH q AS (SELECT websearch_to_tsquery('simple', %s) AS query)
+        SELECT hit.*, u.username, u.avatar_url,
+            ts_headline('simple',
+                replace(replace(replace(hit.content, '&', '&amp;'), '<', '&lt;'), '>', '&gt;'),
+                q.query, %s) AS snippet
+        FROM (
+            SELECT m.id, m.chat_id, m.sender_id, m.content, m.type, m.created_at, m.media_sha256,
+                ts_rank(m.search_vector, q.query) AS rank
+            FROM messages m, q
+            WHERE m.search_vector @@ q.query
+            AND m.chat_id IN (SELECT chat_id FROM chat_participants WHERE user_id = %s)
+            {chat_filter}
+            AND (ts_rank(m.search_vector, q.query), m.id) < (%s::real, %s)
+            ORDER BY rank DESC, m.id DESC
+            LIMIT %s
+        ) hit
+        CROSS JOIN q
+        JOIN users u ON u.id = hit.sender_id
+        ORDER BY hit.rank DESC, hit.id DESC""",
+        (params['q'], HEADLINE_OPTIONS, user_id) + chat_args + (after_rank, after_id, limit + 1)
+    )
+    hits = cur.fetchall()
+    has_more = len(hits) > limit
+    hits = hits[:limit]
+    next_cursor = encode_cursor({'rank': hits[-1]['rank'], 'id': hits[-1]['id']}) if has_more else None
+    
+    return json_response(200, {
+        'success': True,
+        'results': [{
+            'id': hit['id'],
+            'chat_id': hit['chat_id'],
+            'sender_id': hit['sender_id'],
+            'content': hit['content'],
+            'type': hit['type'],
+            'created_at': hit['created_at'].isoformat(),
+            'snippet': hit['snippet'],
+            'rank': hit['rank'],
+            'sender': {
+                'username': hit['username'],
+                'avatar_url': hit['avatar_url']
+            }
+        } for hit in hits],
+        'has_more': has_more,
+        'next_cursor': next_cursor
+    })
+
+def sync_messages(conn: Any, cur: Any, user_id: int, params: Dict[str, str]) -> Dict[str, Any]:
+    chat_id = params.get('chat_id')
+    
+    try:
+        limit = parse_limit(params.get('limit'), DELTA_PAGE_SIZE, DELTA_PAGE_SIZE)
+        sync = decode_cursor(params.get('sync_token'))
+        after_id = int(sync['after_id']) if sync else int(params['after_id'])
+        after_at = datetime.fromisoformat(sync['after_at']) if sync and sync.get('after_at') else None
+        chat_id = int(chat_id)
+        wait = min(max(float(params.get('wait') or 0), 0), MAX_SYNC_WAIT)
+    except (InvalidCursor, KeyError, TypeError, ValueError):
+        return json_response(400, {'error': 'Invalid sync token'})
+    
+    deadline = time.monotonic() + wait
+    listening = False
+    try:
+        while True:
+            cur.execute(
+                READ_MARKS_CTE + """
+                SELECT w.*, m.* FROM w LEFT JOIN LATERAL (
+                    SELECT m.id, m.chat_id, m.sender_id, m.content, m.type, m.created_at, m.media_sha256,
+                        u.username, u.avatar_url
+                    FROM messages m
+                    JOIN users u ON m.sender_id = u.id
+                    WHERE m.chat_id = %s AND m.id > %s
+                        AND (%s::timestamp IS NULL OR m.created_at >= %s::timestamp - %s::interval)
+                    ORDER BY m.id ASC
+                    LIMIT %s
+                ) m ON true""",
+                (user_id, user_id, user_id, chat_id, chat_id, after_id,
+                 after_at, after_at, PARTITION_PRUNE_SLACK, limit + 1)
+            )
+            rows = cur.fetchall()
+            
+            if not rows[0]['is_member']:
+                return NOT_PARTICIPANT_RESPONSE
+            
+            messages = [row for row in rows if row['id'] is not None]
+            has_more = len(messages) > limit
+            messages = messages[:limit]
+            
+            remaining = deadline - time.monotonic()
+            if messages or remaining <= 0:
+                break
+            if listening:
+                conn.commit()
+                wait_for_notify(conn, remaining)
+            else:
+                cur.execute(f'LISTEN chat_messages_{chat_id}')
+                conn.commit()
+                listening = True
+    finally:
+        if listening:
+            conn.rollback()
+            cur.execute('UNLISTEN *')
+            conn.commit()
+    
+    if messages:
+        after_id = messages[-1]['id']
+        after_at = messages[-1]['created_at']
+    
+    return json_response(200, {
+        'success': True,
+        'messages': [message_to_dict(msg, user_id) for msg in messages],
+        'has_more': has_more,
+        'read_up_to': rows[0]['peer_read'],
+        'sync_token': encode_sync_token(after_id, after_at)
+    })
+
+def chat_history(conn: Any, cur: Any, user_id: int, params: Dict[str, str]) -> Dict[str, Any]:
+    try:
+        chat_id = int(params.get('chat_id'))
+    except (TypeError, ValueError):
+        return json_response(400, {'error': 'chat_id must be an integer'})
+    
+    try:
+        limit = parse_limit(params.get('limit'), HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE)
+        cursor = decode_cursor(params.get('cursor'))
+        before_id = int(cursor['before_id']) if cursor else MAX_MESSAGE_ID
+        before_at = datetime.fromisoformat(cursor['before_at']) if cursor and cursor.get('before_at') else None
+        if params.get('before_id'):
+            before_id = int(params['before_id'])
+            before_at = None
+    except (InvalidCursor, KeyError, TypeError, ValueError):
+        return json_response(400, {'error': 'Invalid pagination parameters'})
+    
+    cur.execute(
+        READ_MARKS_CTE + """
+        SELECT w.*, m.* FROM w LEFT JOIN LATERAL (
+            SELECT m.id, m.chat_id, m.sender_id, m.content, m.type, m.created_at, m.media_sha256,
+                u.username, u.avatar_url
+            FROM messages m
+            JOIN users u ON m.sender_id = u.id
+            WHERE m.chat_id = %s AND m.id < %s
+                AND (%s::timestamp IS NULL OR m.created_at <= %s::timestamp + %s::interval)
+            ORDER BY m.id DESC
+            LIMIT %s
+        ) m ON true""",
+        (user_id, user_id, user_id, chat_id, chat_id, before_id,
+         before_at, before_at, PARTITION_PRUNE_SLACK, limit + 1)
+    )
+    rows = cur.fetchall()
+    
+    if not rows[0]['is_member']:
+        return NOT_PARTICIPANT_RESPONSE
+    
+    messages = [row for row in rows if row['id'] is not None]
+    if len(messages) <= limit:
+        oldest_id = messages[-1]['id'] if messages else before_id
+        messages += fetch_archived_messages(cur, chat_id, oldest_id, limit + 1 - len(messages))
+        for msg in messages:
+            msg.setdefault('peer_read', rows[0]['peer_read'])
+            msg.setdefault('my_read', rows[0]['my_read'])
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    messages.reverse()
+    next_cursor = encode_cursor({
+        'before_id': messages[0]['id'],
+        'before_at': messages[0]['created_at'].isoformat()
+    }) if has_more else None
+    sync_token = None
+    if before_id == MAX_MESSAGE_ID:
+        sync_token = encode_sync_token(messages[-1]['id'], messages[-1]['created_at']) if messages else encode_sync_token(0, None)
+    
+    return json_response(200, {
+        'success': True,
+        'messages': [message_to_dict(msg, user_id) for msg in messages],
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+        'read_up_to': rows[0]['peer_read'],
+        'sync_token': sync_token
+    })
+
+def chat_list(conn: Any, cur: Any, user_id: int, params: Dict[str, str]) -> Dict[str, Any]:
+    execute_prepared(cur, CHAT_LIST, (user_id,))
+    chats = cur.fetchall()
+    
+    return json_response(200, {
+        'success': True,
+        'chats': [{
+            'id': chat['id'],
+            'type': chat['type'],
+            'name': chat['name'],
+            'avatar_url': chat['avatar_url'],
+            'unread_count': chat['unread_count'],
+            'peer_id': chat['peer_id'],
+            'last_message': chat['last_message'],
+            'last_message_time': chat['last_message_time'].isoformat() if chat['last_message_time'] else None
+        } for chat in chats]
+    })
+
+def chat_list_etag(cur: Any, user_id: int, params: Dict[str, str]) -> Optional[str]:
+    """
+    Business: Validator for the chat list without building it
+    Args: cur - cursor, user_id - reader, params - query parameters
+    Returns: ETag that changes with any new message, membership change or read mark of the user
+    """
+    cur.execute(
+        """SELECT COUNT(*) AS chats, MAX(c.updated_at) AS updated_at, MAX(cp.joined_at) AS joined_at,
+            COALESCE(SUM(cp.unread_count), 0) AS unread, COALESCE(SUM(cp.read_count), 0) AS read
+        FROM chat_participants cp
+        JOIN chats c ON c.id = cp.chat_id
+        WHERE cp.user_id = %s""",
+        (user_id,)
+    )
+    state = cur.fetchone()
+    return make_etag('chats', user_id, state['chats'], state['updated_at'], state['joined_at'],
+                     state['unread'], state['read'])
+
+def chat_history_etag(cur: Any, user_id: int, params: Dict[str, str]) -> Optional[str]:
+    """
+    Business: Validator for a history page without fetching its messages
+    Args: cur - cursor, user_id - reader, params - query parameters of the page
+    Returns: ETag that changes with the chat's last message and either side's read mark;
+             None for non-members and malformed chat ids so chat_history answers them
+    """
+    try:
+        chat_id = int(params.get('chat_id'))
+    except (TypeError, ValueError):
+        return None
+    
+    cur.execute(
+        READ_MARKS_CTE + """
+        SELECT w.*, c.last_message_id, c.updated_at FROM w LEFT JOIN chats c ON c.id = %s""",
+        (user_id, user_id, user_id, chat_id, chat_id)
+    )
+    state = cur.fetchone()
+    if not state['is_member']:
+        return None
+    return make_etag('history', user_id, sorted(params.items()), state['last_message_id'], state['updated_at'],
+                     state['peer_read'], state['my_read'])
+
+ACTIONS = {
+    'send': send_message,
+    'send_batch': send_batch,
+    'mark_read': mark_read,
+    'sync_contacts': sync_contacts,
+    'heartbeat': heartbeat,
+    'create_chat': create_chat,
+    'create_group': create_group,
+    'add_members': change_members,
+    'remove_member': change_members
+}
+
+def select_read(params: Dict[str, str]) -> Any:
+    """GET mode chosen by which query parameters are present"""
+    if params.get('presence'):
+        return read_presence
+    if params.get('q'):
+        return search_messages
+    if params.get('chat_id') and (params.get('after_id') or params.get('sync_token')):
+        return sync_messages
+    if params.get('chat_id'):
+        return chat_history
+    return chat_list
+
+VALIDATORS = {
+    chat_list: chat_list_etag,
+    chat_history: chat_history_etag
+}
+
+def conditional_read(conn: Any, cur: Any, user_id: int, event: Dict[str, Any], params: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Business: Run a GET read, answering 304 when If-None-Match still matches its validator
+    Args: conn, cur - database, user_id - reader, event - request, params - query parameters
+    Returns: 304 without running the read, or the read's response carrying an ETag
+    """
+    read = select_read(params)
+    validator = VALIDATORS.get(read)
+    if validator is None:
+        return read(conn, cur, user_id, params)
+    
+    with phase('validate'):
+        etag = validator(cur, user_id, params)
+    if etag is not None and etag_matches(event, etag):
+        return not_modified(etag)
+    
+    # The validator ran first, so a write landing in between only makes the next request refetch
+    response = read(conn, cur, user_id, params)
+    if etag is None or response['statusCode'] != 200:
+        return response
+    return with_etag(response, etag)
+
+def handle(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Business: Send and receive messages in chats
+    Args: event with httpMethod GET or POST, body, headers with X-Session-Token;
+          OPTIONS and missing tokens are answered by index.py
+    Returns: HTTP response with messages or send confirmation
+    """
+    method: str = event.get('httpMethod', 'GET')
+    session_token = get_session_token(event)
+    params = event.get('queryStringParameters') or {}
+    
+    with phase('connect'):
+        if method == 'GET' and not params.get('wait'):
+            conn = get_read_connection(session_token, get_write_position(event))
+        else:
+            conn = get_connection()
+    
+    try:
+        with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+            with phase('session'):
+                user_id = resolve_session(cur, session_token)
+            
+            if user_id is None:
+                return INVALID_SESSION_RESPONSE
+            
+            record_heartbeat(user_id)
+            if not is_replica_connection(conn):
+                flush_presence(conn)
+            
+            if method == 'POST':
+                body_data = json.loads(event.get('body', '{}'))
+                return dispatch_action(ACTIONS, body_data.get('action'), conn, cur, user_id, session_token, body_data)
+            
+            return conditional_read(conn, cur, user_id, event, params)
+    
+    finally:
+        release_connection(conn)
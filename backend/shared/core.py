@@ -0,0 +1,272 @@
+import base64
+import gzip
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from typing import Dict, Any, Optional, Sequence
+
+from shared.timing import annotate, dumps, phase, timed_handler
+
+WRITE_POSITION_HEADER = 'X-Write-LSN'
+
+JSON_HEADERS = {
+    'Content-Type': 'application/json',
+    'Access-Control-Allow-Origin': '*'
+}
+
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+REVALIDATE_CACHE_CONTROL = 'private, no-cache'
+
+_functions: Dict[str, 'Function'] = {}
+_brotli: Any = None
+
+
+def json_response(status: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS,
+        'body': dumps(payload),
+        'isBase64Encoded': False
+    }
+
+
+def constant_response(status: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """json_response serialized once at import, for bodies that never change"""
+    return {
+        'statusCode': status,
+        'headers': JSON_HEADERS,
+        'body': json.dumps(payload),
+        'isBase64Encoded': False
+    }
+
+
+METHOD_NOT_ALLOWED_RESPONSE = constant_response(405, {'error': 'Method not allowed'})
+INVALID_ACTION_RESPONSE = constant_response(400, {'error': 'Invalid action'})
+
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    headers = event.get('headers') or {}
+    value = headers.get(name) or headers.get(name.lower())
+    if value is None:
+        lowered = name.lower()
+        value = next((v for k, v in headers.items() if k.lower() == lowered), None)
+    return value
+
+
+def get_session_token(event: Dict[str, Any]) -> Optional[str]:
+    headers = event.get('headers') or {}
+    return headers.get('x-session-token') or headers.get('X-Session-Token')
+
+
+def get_write_position(event: Dict[str, Any]) -> Optional[str]:
+    """Primary WAL position of the client's last write, echoed back from an earlier response"""
+    return get_header(event, WRITE_POSITION_HEADER)
+
+
+def get_client_ip(event: Dict[str, Any]) -> Optional[str]:
+    """Caller address as seen by the API gateway (never taken from client-controlled headers)"""
+    identity = (event.get('requestContext') or {}).get('identity') or {}
+    return identity.get('sourceIp') or None
+
+
+def make_etag(*parts: Any) -> str:
+    """Strong validator from the values a response was built from"""
+    digest = hashlib.blake2b('\x1f'.join(map(str, parts)).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(event: Dict[str, Any], etag: str) -> bool:
+    """True when If-None-Match lists etag (weak comparison, as RFC 9110 prescribes for GET)"""
+    header = get_header(event, 'If-None-Match')
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(',')]
+    return '*' in candidates or etag in (tag[2:] if tag.startswith('W/') else tag for tag in candidates)
+
+
+def not_modified(etag: str) -> Dict[str, Any]:
+    return {
+        'statusCode': 304,
+        'headers': {
+            'Access-Control-Allow-Origin': '*',
+            'ETag': etag,
+            'Cache-Control': REVALIDATE_CACHE_CONTROL,
+            'Vary': 'Accept-Encoding'
+        },
+        'body': '',
+        'isBase64Encoded': False
+    }
+
+
+def with_etag(response: Dict[str, Any], etag: str) -> Dict[str, Any]:
+    headers = dict(response['headers'], ETag=etag)
+    headers['Cache-Control'] = REVALIDATE_CACHE_CONTROL
+    headers['Vary'] = 'Accept-Encoding'
+    return dict(response, headers=headers)
+
+
+def load_brotli() -> Any:
+    """The brotli module, or False when it is not installed (gzip is used instead)"""
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli
+
+
+def accepted_encoding(event: Dict[str, Any]) -> Optional[str]:
+    """
+    Business: Pick the response encoding from Accept-Encoding
+    Args: event - request with headers
+    Returns: 'br' (when brotli is installed) or 'gzip' if the client accepts it with q > 0, else None
+    """
+    header = get_header(event, 'Accept-Encoding')
+    if not header:
+        return None
+    accepted = {}
+    for item in header.split(','):
+        coding, _, options = item.strip().partition(';')
+        quality = 1.0
+        options = options.strip()
+        if options.startswith('q='):
+            try:
+                quality = float(options[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    wildcard = accepted.get('*', 0.0)
+    available = ('br', 'gzip') if load_brotli() else ('gzip',)
+    for coding in available:
+        if accepted.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+def compress_response(event: Dict[str, Any], response: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Business: Compress large text bodies for clients that accept br/gzip, using the base64 response mode
+    Args: event - request with Accept-Encoding, response - handler result
+    Returns: response with Content-Encoding and a base64 body, or the response unchanged when it is
+             small, already binary/encoded, or the client accepts neither encoding
+    """
+    body = response.get('body')
+    if not body or response.get('isBase64Encoded') or len(body) < COMPRESS_MIN_BYTES:
+        return response
+    headers = dict(response.get('headers') or {})
+    if 'Content-Encoding' in headers:
+        return response
+    headers['Vary'] = 'Accept-Encoding'
+    coding = accepted_encoding(event)
+    if coding is None:
+        return dict(response, headers=headers)
+
+    data = body.encode()
+    if coding == 'br':
+        compressed = load_brotli().compress(data, quality=BROTLI_QUALITY)
+    else:
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    if len(compressed) >= len(data):
+        return dict(response, headers=headers)
+    headers['Content-Encoding'] = coding
+    return dict(response, headers=headers, body=base64.b64encode(compressed).decode('ascii'), isBase64Encoded=True)
+
+
+class Function:
+    """
+    Business: Entry point shared by the cloud functions; answers CORS preflights, missing-token 401s
+              and unsupported methods from precomputed responses, and imports the function's
+              handlers.py (psycopg2 and everything else heavy) only for the first request that needs it
+    Args: name - function name for logs, implementation - path of the module defining handle(event, context),
+          methods - HTTP methods served besides OPTIONS, allow_headers - CORS request headers,
+          session_methods - methods that are rejected without X-Session-Token,
+          unauthorized - body of that 401, trigger - also pass events without httpMethod
+          (timer and queue triggers) to handle()
+    """
+
+    def __init__(self, name: str, implementation: str, methods: Sequence[str], allow_headers: str,
+                 session_methods: Sequence[str] = (), unauthorized: Optional[Dict[str, Any]] = None,
+                 trigger: bool = False):
+        self.name = name
+        self.implementation = implementation
+        self.methods = frozenset(methods)
+        self.session_methods = frozenset(session_methods)
+        self.trigger = trigger
+        self.preflight = {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': ', '.join(list(methods) + ['OPTIONS']),
+                'Access-Control-Allow-Headers': allow_headers,
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+        self.unauthorized = constant_response(401, unauthorized or {'error': 'Unauthorized'})
+        self.module: Any = None
+        self.import_ms: Optional[float] = None
+        self._timed_dispatch = timed_handler(name)(self._dispatch)
+        _functions[name] = self
+
+    def load(self) -> Any:
+        """Import the implementation once per process; the time it took is kept in import_ms"""
+        if self.module is None:
+            started = time.perf_counter()
+            module_name = f'{self.name}_handlers'
+            spec = importlib.util.spec_from_file_location(module_name, self.implementation)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+            self.import_ms = (time.perf_counter() - started) * 1000
+            self.module = module
+        return self.module
+
+    def _dispatch(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        if self.module is None:
+            with phase('import'):
+                self.load()
+            annotate(cold_start=True, import_ms=round(self.import_ms, 2))
+        response = self.module.handle(event, context)
+        with phase('compress'):
+            return compress_response(event, response)
+
+    def handler(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        if self.trigger and 'httpMethod' not in event:
+            return self._timed_dispatch(event, context)
+        method = event.get('httpMethod', 'GET')
+        if method == 'OPTIONS':
+            return self.preflight
+        if method not in self.methods:
+            return METHOD_NOT_ALLOWED_RESPONSE
+        if method in self.session_methods and not get_session_token(event):
+            return self.unauthorized
+        return self._timed_dispatch(event, context)
+
+
+def dispatch_action(actions: Dict[str, Any], action: Any, *args: Any) -> Dict[str, Any]:
+    """Call actions[action](*args), or answer 400 for an action the function does not have"""
+    annotate(action=action)
+    run = actions.get(action) if isinstance(action, str) else None
+    if run is None:
+        return INVALID_ACTION_RESPONSE
+    return run(*args)
+
+
+def import_stats() -> Dict[str, Any]:
+    """Per-function implementation import time for this process (None until the first request loads it)"""
+    return {
+        name: {'loaded': function.module is not None, 'import_ms': function.import_ms}
+        for name, function in _functions.items()
+    }
+
+
+def implementation_path(index_file: str) -> str:
+    return os.path.join(os.path.dirname(os.path.abspath(index_file)), 'handlers.py')
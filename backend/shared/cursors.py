@@ -0,0 +1,39 @@
+import base64
+import json
+from typing import Dict, Any, Optional
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(position: Dict[str, Any]) -> str:
+    raw = json.dumps(position, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Business: Decode an opaque keyset cursor produced by encode_cursor
+    Args: cursor - value from the query string, may be empty
+    Returns: position dict or None; raises InvalidCursor on tampered input
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(position, dict):
+        raise InvalidCursor('Cursor must encode an object')
+    return position
+
+
+def parse_limit(value: Optional[str], default: int, maximum: int) -> int:
+    if value is None or value == '':
+        return default
+    limit = int(value)
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, maximum)
@@ -0,0 +1,334 @@
+import os
+import re
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+import psycopg2
+import psycopg2.extensions
+from psycopg2.extras import RealDictCursor
+
+from shared.core import WRITE_POSITION_HEADER
+from shared.timing import current_timer, record_query, register_worker_stats, set_response_header
+from shared.ttl_cache import TTLCache
+
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', '4'))
+POOL_WAIT_TIMEOUT = float(os.environ.get('DB_POOL_WAIT_TIMEOUT', '5'))
+POOL_HEALTH_CHECK_AFTER = float(os.environ.get('DB_POOL_HEALTH_CHECK_AFTER', '10'))
+REPLICA_CONNECT_TIMEOUT = int(os.environ.get('DB_REPLICA_CONNECT_TIMEOUT', '2'))
+REPLICA_RETRY_AFTER = float(os.environ.get('DB_REPLICA_RETRY_AFTER', '30'))
+READ_YOUR_WRITES_WINDOW = float(os.environ.get('DB_READ_YOUR_WRITES_WINDOW', '5'))
+RECENT_WRITES_SIZE = 10000
+
+_LSN_PATTERN = re.compile(r'^([0-9A-Fa-f]{1,8})/([0-9A-Fa-f]{1,8})$')
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class TimingCursorMixin:
+    """Adds each statement's duration and row count to the current request timer"""
+
+    def _timed(self, run: Any, query: Any, params: Any) -> Any:
+        started = time.perf_counter()
+        try:
+            return run()
+        finally:
+            record_query(query, params, (time.perf_counter() - started) * 1000, self.rowcount)
+
+    def execute(self, query: Any, vars: Any = None) -> Any:
+        return self._timed(lambda: super(TimingCursorMixin, self).execute(query, vars), query, vars)
+
+    def executemany(self, query: Any, vars_list: Any) -> Any:
+        return self._timed(lambda: super(TimingCursorMixin, self).executemany(query, vars_list), query, vars_list)
+
+
+class TimedCursor(TimingCursorMixin, psycopg2.extensions.cursor):
+    pass
+
+
+class TimedDictCursor(TimingCursorMixin, RealDictCursor):
+    pass
+
+
+class ConnectionPool:
+    """
+    Business: Bounded pool of psycopg2 connections reused across warm invocations
+    Args: dsn - connection string, max_size - cap on open connections,
+          wait_timeout - seconds to wait for a free slot,
+          health_check_after - idle seconds after which a connection is pinged before reuse,
+          connect_kwargs - extra psycopg2.connect arguments (timeouts, session options)
+    """
+
+    def __init__(self, dsn: str, max_size: int = POOL_MAX_SIZE, wait_timeout: float = POOL_WAIT_TIMEOUT,
+                 health_check_after: float = POOL_HEALTH_CHECK_AFTER, **connect_kwargs: Any):
+        self.dsn = dsn
+        self.connect_kwargs = connect_kwargs
+        self.max_size = max_size
+        self.wait_timeout = wait_timeout
+        self.health_check_after = health_check_after
+        self._idle: List[Any] = []
+        self._last_used: Dict[int, float] = {}
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'checkouts': 0,
+            'connects': 0,
+            'reconnects': 0,
+            'health_checks': 0,
+            'discarded': 0,
+            'timeouts': 0,
+            'wait_time_ms': 0.0
+        }
+
+    def _count(self, name: str) -> None:
+        with self._cond:
+            self._stats[name] += 1
+
+    def _connect(self) -> Any:
+        conn = psycopg2.connect(self.dsn, **self.connect_kwargs)
+        self._count('connects')
+        return conn
+
+    def _is_alive(self, conn: Any) -> bool:
+        if conn.closed:
+            return False
+        idle_for = time.monotonic() - self._last_used.get(id(conn), 0.0)
+        if idle_for < self.health_check_after:
+            return True
+        self._count('health_checks')
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+            conn.rollback()
+            return True
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            return False
+
+    def _close(self, conn: Any) -> None:
+        self._last_used.pop(id(conn), None)
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+    def getconn(self) -> Any:
+        started = time.monotonic()
+        with self._cond:
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = self.wait_timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f'No free database connection after {self.wait_timeout}s')
+                self._cond.wait(remaining)
+            conn = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_ms'] += (time.monotonic() - started) * 1000
+
+        try:
+            if conn is not None and not self._is_alive(conn):
+                self._close(conn)
+                self._count('reconnects')
+                conn = None
+            if conn is None:
+                conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def putconn(self, conn: Any) -> None:
+        keep = not conn.closed
+        if keep and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                keep = False
+        if not keep:
+            self._count('discarded')
+            self._close(conn)
+
+        with self._cond:
+            self._in_use -= 1
+            if keep:
+                self._last_used[id(conn)] = time.monotonic()
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(self._stats, wait_time_ms=round(self._stats['wait_time_ms'], 2),
+                        idle=len(self._idle), in_use=self._in_use, max_size=self.max_size)
+
+
+_pool: Optional[ConnectionPool] = None
+_replica_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+_replica_owned: Dict[int, bool] = {}
+_replica_down_until = 0.0
+_replica_replayed: Dict[int, Tuple[int, int]] = {}
+# Per-worker memory of the primary WAL position of each session's last write
+_recent_writes = TTLCache(RECENT_WRITES_SIZE, READ_YOUR_WRITES_WINDOW)
+_route_lock = threading.Lock()
+_route_stats = {'primary': 0, 'replica': 0, 'read_your_writes': 0, 'fallback': 0, 'session_retry': 0}
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(os.environ.get('DATABASE_URL'), cursor_factory=TimedCursor)
+    return _pool
+
+
+def get_replica_pool() -> Optional[ConnectionPool]:
+    global _replica_pool
+    dsn = os.environ.get('DATABASE_READ_URL')
+    if not dsn:
+        return None
+    if _replica_pool is None:
+        with _pool_lock:
+            if _replica_pool is None:
+                _replica_pool = ConnectionPool(
+                    dsn,
+                    connect_timeout=REPLICA_CONNECT_TIMEOUT,
+                    cursor_factory=TimedCursor,
+                    options='-c default_transaction_read_only=on'
+                )
+    return _replica_pool
+
+
+def get_connection() -> Any:
+    return get_pool().getconn()
+
+
+def parse_lsn(text: Optional[str]) -> Optional[int]:
+    """pg_lsn text ('16/B374D848') as an integer, or None when it is missing or malformed"""
+    match = _LSN_PATTERN.match(text.strip()) if text else None
+    if match is None:
+        return None
+    return (int(match.group(1), 16) << 32) + int(match.group(2), 16)
+
+
+def _replica_caught_up(conn: Any, lsn: int) -> bool:
+    """Replay only moves forward, so each connection's last seen position answers most checks locally"""
+    pid = conn.get_backend_pid()
+    seen_pid, seen_lsn = _replica_replayed.get(id(conn), (None, -1))
+    if seen_pid == pid and lsn <= seen_lsn:
+        return True
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_last_wal_replay_lsn()::text")
+        replayed = cur.fetchone()[0]
+    conn.rollback()
+    if replayed is None:
+        return True
+    _replica_replayed[id(conn)] = (pid, parse_lsn(replayed))
+    return lsn <= parse_lsn(replayed)
+
+
+def get_read_connection(session_token: Optional[str] = None, write_position: Optional[str] = None) -> Any:
+    """
+    Business: Check out a connection for read-only queries, preferring DATABASE_READ_URL
+    Args: session_token - caller's token; a session that wrote within READ_YOUR_WRITES_WINDOW
+          on this worker only reads from a replica that has replayed past that write,
+          write_position - X-Write-LSN the client echoed from its last write on any worker
+    Returns: replica connection, or a primary one when no replica is configured, it is
+             behind the caller's last write or unreachable
+    """
+    global _replica_down_until
+    replica = get_replica_pool()
+    if replica is None:
+        note_route('primary')
+        return get_connection()
+    if time.monotonic() < _replica_down_until:
+        note_route('fallback')
+        return get_connection()
+
+    recent_lsn = _recent_writes.get(session_token)[1] if session_token else None
+    positions = [parse_lsn(write_position), parse_lsn(recent_lsn)]
+    min_lsn = max((lsn for lsn in positions if lsn is not None), default=None)
+    try:
+        conn = replica.getconn()
+    except (psycopg2.OperationalError, PoolTimeout):
+        _replica_down_until = time.monotonic() + REPLICA_RETRY_AFTER
+        note_route('fallback')
+        return get_connection()
+
+    try:
+        caught_up = min_lsn is None or _replica_caught_up(conn, min_lsn)
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        replica.putconn(conn)
+        note_route('fallback')
+        return get_connection()
+    if not caught_up:
+        replica.putconn(conn)
+        note_route('read_your_writes')
+        return get_connection()
+
+    _replica_owned[id(conn)] = True
+    note_route('replica')
+    return conn
+
+
+def is_replica_connection(conn: Any) -> bool:
+    return id(conn) in _replica_owned
+
+
+def commit_write(conn: Any, session_token: Optional[str] = None) -> Optional[str]:
+    """
+    Business: Commit on the primary and hand out the WAL position so the writer's next reads see it
+    Args: conn - primary connection with an open write transaction, session_token - writer's token
+    Returns: the position, also sent as the X-Write-LSN response header for the client to echo
+             on reads that may land on another worker; None when no replica is configured
+    """
+    conn.commit()
+    if get_replica_pool() is None:
+        return None
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_current_wal_lsn()::text")
+        lsn = cur.fetchone()[0]
+    conn.rollback()
+    if session_token:
+        _recent_writes.put(session_token, lsn)
+    set_response_header(WRITE_POSITION_HEADER, lsn)
+    return lsn
+
+
+def note_route(route: str) -> None:
+    """Count a read routing decision for the worker stats and tag the request's log line with it"""
+    with _route_lock:
+        _route_stats[route] += 1
+    timer = current_timer()
+    if timer is not None:
+        previous = timer.fields.get('route')
+        timer.fields['route'] = f'{previous}+{route}' if previous else route
+
+
+def release_connection(conn: Any) -> None:
+    if _replica_owned.pop(id(conn), False):
+        get_replica_pool().putconn(conn)
+    else:
+        get_pool().putconn(conn)
+
+
+def pool_stats() -> Dict[str, Any]:
+    replica = get_replica_pool()
+    stats = get_pool().stats()
+    if replica is not None:
+        stats['replica'] = replica.stats()
+    return stats
+
+
+register_worker_stats('pool', pool_stats)
+
+
+def route_stats() -> Dict[str, int]:
+    with _route_lock:
+        return dict(_route_stats)
+
+
+register_worker_stats('routes', route_stats)
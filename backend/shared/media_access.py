@@ -0,0 +1,21 @@
+from typing import Any, Iterable, Set
+
+
+def accessible_media(cur: Any, user_id: int, sha256s: Iterable[str]) -> Set[str]:
+    """
+    Business: Which of the given blobs the user may read or attach to a message
+    Args: cur - open RealDictCursor, user_id - requester, sha256s - media ids to check
+    Returns: the subset the user uploaded themselves (server-hashed) or can see through a chat they belong to
+    """
+    wanted = sorted(set(sha256s))
+    if not wanted:
+        return set()
+    cur.execute(
+        """SELECT sha256 FROM media_owners WHERE user_id = %s AND sha256 = ANY(%s)
+        UNION
+        SELECT cm.sha256 FROM chat_media cm
+        JOIN chat_participants cp ON cp.chat_id = cm.chat_id AND cp.user_id = %s
+        WHERE cm.sha256 = ANY(%s)""",
+        (user_id, wanted, user_id, wanted)
+    )
+    return {row['sha256'] for row in cur.fetchall()}
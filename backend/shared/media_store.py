@@ -0,0 +1,120 @@
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, Optional, Tuple
+
+MEDIA_STORAGE_DIR = os.environ.get('MEDIA_STORAGE_DIR', os.path.join(tempfile.gettempdir(), 'veas-media'))
+COPY_BUFFER_SIZE = 1024 * 1024
+
+_SHA256 = re.compile(r'^[0-9a-f]{64}$')
+_UPLOAD_ID = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+
+def is_sha256(value: Optional[str]) -> bool:
+    return isinstance(value, str) and bool(_SHA256.match(value))
+
+
+class LocalMediaStore:
+    """
+    Business: Filesystem media store; blobs are addressed by SHA-256, so identical content is kept once
+    Args: root - directory holding blobs/, thumbs/ and uploads/
+    """
+
+    def __init__(self, root: str = MEDIA_STORAGE_DIR):
+        self.root = root
+
+    def _blob_path(self, sha256: str) -> str:
+        if not is_sha256(sha256):
+            raise ValueError('Invalid media id')
+        return os.path.join(self.root, 'blobs', sha256[:2], sha256[2:4], sha256)
+
+    def _thumbnail_path(self, sha256: str) -> str:
+        if not is_sha256(sha256):
+            raise ValueError('Invalid media id')
+        return os.path.join(self.root, 'thumbs', sha256[:2], f'{sha256}.jpg')
+
+    def _upload_dir(self, upload_id: str) -> str:
+        if not _UPLOAD_ID.match(upload_id):
+            raise ValueError('Invalid upload id')
+        return os.path.join(self.root, 'uploads', upload_id)
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        with os.fdopen(fd, 'wb') as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+
+    def write_chunk(self, upload_id: str, index: int, data: bytes) -> None:
+        self._write_atomic(os.path.join(self._upload_dir(upload_id), f'{index:06d}'), data)
+
+    def chunk_sizes(self, upload_id: str) -> Dict[int, int]:
+        directory = self._upload_dir(upload_id)
+        if not os.path.isdir(directory):
+            return {}
+        return {
+            int(name): os.path.getsize(os.path.join(directory, name))
+            for name in os.listdir(directory) if name.isdigit()
+        }
+
+    def assemble(self, upload_id: str, chunk_count: int) -> Tuple[str, int, str]:
+        """
+        Business: Concatenate an upload's chunks into a temporary file while hashing them
+        Args: upload_id - upload session, chunk_count - chunks expected (0..chunk_count-1)
+        Returns: (sha256 hex, size, temporary path) to pass to store_blob
+        """
+        directory = self._upload_dir(upload_id)
+        os.makedirs(os.path.join(self.root, 'blobs'), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, 'blobs'), prefix='.assemble-')
+        digest = hashlib.sha256()
+        size = 0
+        with os.fdopen(fd, 'wb') as out:
+            for index in range(chunk_count):
+                with open(os.path.join(directory, f'{index:06d}'), 'rb') as chunk:
+                    while True:
+                        block = chunk.read(COPY_BUFFER_SIZE)
+                        if not block:
+                            break
+                        digest.update(block)
+                        out.write(block)
+                        size += len(block)
+        return digest.hexdigest(), size, tmp_path
+
+    def store_blob(self, sha256: str, tmp_path: str) -> bool:
+        """Move an assembled file into place; returns False (and drops it) when the blob already exists"""
+        path = self._blob_path(sha256)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return True
+
+    def discard_upload(self, upload_id: str) -> None:
+        shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+    def has_blob(self, sha256: str) -> bool:
+        return os.path.exists(self._blob_path(sha256))
+
+    def blob_path(self, sha256: str) -> str:
+        return self._blob_path(sha256)
+
+    def read_range(self, sha256: str, start: int, end: int, thumbnail: bool = False) -> bytes:
+        """Bytes start..end inclusive of the blob (or its thumbnail)"""
+        path = self._thumbnail_path(sha256) if thumbnail else self._blob_path(sha256)
+        with open(path, 'rb') as blob:
+            blob.seek(start)
+            return blob.read(end - start + 1)
+
+    def size(self, sha256: str, thumbnail: bool = False) -> Optional[int]:
+        path = self._thumbnail_path(sha256) if thumbnail else self._blob_path(sha256)
+        return os.path.getsize(path) if os.path.exists(path) else None
+
+    def write_thumbnail(self, sha256: str, data: bytes) -> None:
+        self._write_atomic(self._thumbnail_path(sha256), data)
+
+
+media_store = LocalMediaStore()
@@ -0,0 +1,55 @@
+import os
+from typing import Dict, Any, FrozenSet
+
+from shared.timing import register_worker_stats
+from shared.ttl_cache import TTLCache
+
+MEMBER_CACHE_SIZE = int(os.environ.get('MEMBER_CACHE_SIZE', '1000'))
+MEMBER_CACHE_TTL = float(os.environ.get('MEMBER_CACHE_TTL', '30'))
+
+# Member sets changed by other workers show up after at most MEMBER_CACHE_TTL seconds
+member_cache = TTLCache(MEMBER_CACHE_SIZE, MEMBER_CACHE_TTL)
+
+
+def get_chat_members(cur: Any, chat_id: int) -> FrozenSet[int]:
+    """
+    Business: Member ids of a chat, from the worker cache before the database
+    Args: cur - open RealDictCursor, chat_id - chat to look up
+    Returns: frozenset of user ids; empty when the chat does not exist
+    """
+    found, members = member_cache.get(chat_id)
+    if found:
+        return members
+    return load_chat_members(cur, chat_id)
+
+
+def load_chat_members(cur: Any, chat_id: int) -> FrozenSet[int]:
+    """
+    Business: Read a chat's member ids from the database and refresh the worker cache with them
+    Args: cur - open RealDictCursor, chat_id - chat to look up
+    Returns: frozenset of user ids; empty when the chat does not exist
+    """
+    cur.execute("SELECT user_id FROM chat_participants WHERE chat_id = %s", (chat_id,))
+    members = frozenset(row['user_id'] for row in cur.fetchall())
+    member_cache.put(chat_id, members)
+    return members
+
+
+def is_chat_member(cur: Any, chat_id: int, user_id: int) -> bool:
+    """
+    Business: Membership check that never rejects on a stale cached set
+    Args: cur - open RealDictCursor, chat_id - chat, user_id - user to check
+    Returns: True when the user belongs to the chat; a cached set without the user is reloaded once
+             first, since another worker may have added them within the TTL
+    """
+    found, members = member_cache.get(chat_id)
+    if found and user_id in members:
+        return True
+    return user_id in load_chat_members(cur, chat_id)
+
+
+def member_cache_stats() -> Dict[str, Any]:
+    return member_cache.stats()
+
+
+register_worker_stats('members', member_cache_stats)
@@ -0,0 +1,21 @@
+import select
+import time
+from typing import Any
+
+
+def wait_for_notify(conn: Any, timeout: float) -> bool:
+    """
+    Business: Block until a LISTENed channel fires on this connection or the timeout passes
+    Args: conn - connection that ran LISTEN and has no open transaction, timeout - seconds to wait
+    Returns: True when a notification arrived; one libpq already buffered (e.g. for a write committed
+             while the caller was querying) is returned at once instead of waiting out the timeout
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        conn.poll()
+        if conn.notifies:
+            conn.notifies.clear()
+            return True
+        remaining = deadline - time.monotonic()
+        if remaining <= 0 or select.select([conn], [], [], remaining) == ([], [], []):
+            return False
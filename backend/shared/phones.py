@@ -0,0 +1,18 @@
+import hashlib
+
+PHONE_NUMBER_LENGTH = 20
+
+
+def normalize_phone(raw: str) -> str:
+    """
+    Business: Canonical form of a phone number as stored in users.phone_number
+    Args: raw - number as typed, with any spaces, dashes or parentheses
+    Returns: its digits, with a leading + when the input had one
+    """
+    digits = ''.join(ch for ch in raw if ch.isdigit())
+    return f'+{digits}' if raw.strip().startswith('+') else digits
+
+
+def phone_hash(raw: str) -> str:
+    """SHA-256 hex of the normalized number, matching the users.phone_hash generated column"""
+    return hashlib.sha256(normalize_phone(raw).encode('utf-8')).hexdigest()
@@ -0,0 +1,133 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional
+from psycopg2.extras import execute_values
+
+PRESENCE_ONLINE_TTL = float(os.environ.get('PRESENCE_ONLINE_TTL', '60'))
+PRESENCE_FLUSH_INTERVAL = float(os.environ.get('PRESENCE_FLUSH_INTERVAL', '15'))
+PRESENCE_BUFFER_SIZE = 50000
+
+
+class PresenceBuffer:
+    """
+    Business: Per-worker buffer of heartbeats; repeated beats of one user collapse into one pending last_seen
+    Args: flush_interval - minimum seconds between batched writes to users,
+          max_size - pending users that force an early flush
+    """
+
+    def __init__(self, flush_interval: float = PRESENCE_FLUSH_INTERVAL, max_size: int = PRESENCE_BUFFER_SIZE):
+        self.flush_interval = flush_interval
+        self.max_size = max_size
+        self._pending: Dict[int, datetime] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {'heartbeats': 0, 'flushes': 0, 'rows_written': 0}
+
+    def touch(self, user_id: int) -> None:
+        with self._lock:
+            self._pending[user_id] = datetime.now()
+            self._stats['heartbeats'] += 1
+
+    def pending(self, user_ids: List[int]) -> Dict[int, datetime]:
+        with self._lock:
+            return {uid: self._pending[uid] for uid in user_ids if uid in self._pending}
+
+    def due(self) -> bool:
+        with self._lock:
+            return bool(self._pending) and (
+                time.monotonic() - self._last_flush >= self.flush_interval or len(self._pending) >= self.max_size
+            )
+
+    def flush(self, conn: Any, force: bool = False) -> int:
+        """
+        Business: Write the buffered last_seen values in one multi-row UPDATE and commit it
+        Args: conn - primary connection with no open work, force - flush even before flush_interval
+        Returns: number of users written
+        """
+        if not force and not self.due():
+            return 0
+        with self._lock:
+            batch, self._pending = self._pending, {}
+            self._last_flush = time.monotonic()
+        if not batch:
+            return 0
+
+        try:
+            with conn.cursor() as cur:
+                # id order keeps concurrent flushes from different workers deadlock-free
+                execute_values(
+                    cur,
+                    """UPDATE users u SET last_seen = v.seen, is_online = true
+                    FROM (VALUES %s) AS v(id, seen)
+                    WHERE u.id = v.id AND (u.last_seen IS NULL OR u.last_seen < v.seen)""",
+                    sorted(batch.items()),
+                    template='(%s, %s::timestamp)',
+                    page_size=len(batch)
+                )
+            conn.commit()
+        except Exception:
+            with self._lock:
+                for user_id, seen in batch.items():
+                    if self._pending.get(user_id, seen) <= seen:
+                        self._pending[user_id] = seen
+            raise
+
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['rows_written'] += len(batch)
+        return len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, pending=len(self._pending))
+
+
+presence_buffer = PresenceBuffer()
+
+
+def record_heartbeat(user_id: int) -> None:
+    presence_buffer.touch(user_id)
+
+
+def flush_presence(conn: Any, force: bool = False) -> int:
+    return presence_buffer.flush(conn, force)
+
+
+def presence_entry(last_seen: Optional[datetime], buffered: Optional[datetime], now: datetime,
+                   ttl: float = PRESENCE_ONLINE_TTL) -> Dict[str, Any]:
+    """
+    Business: One user's online status from the stored last_seen and a heartbeat still buffered in this worker
+    Args: last_seen - users.last_seen, buffered - pending heartbeat or None, now - database NOW()::timestamp,
+          ttl - seconds a heartbeat keeps a user online
+    Returns: {'is_online', 'last_seen'}
+    """
+    if buffered is not None and (last_seen is None or buffered > last_seen):
+        last_seen = buffered
+    return {
+        'is_online': last_seen is not None and now - last_seen < timedelta(seconds=ttl),
+        'last_seen': last_seen.isoformat() if last_seen else None
+    }
+
+
+def get_presence(cur: Any, user_ids: List[int], ttl: float = PRESENCE_ONLINE_TTL) -> Dict[int, Dict[str, Any]]:
+    """
+    Business: Online status for a set of users, derived from last_seen instead of the stored flag
+    Args: cur - open RealDictCursor, user_ids - users to look up, ttl - seconds a heartbeat keeps a user online
+    Returns: {user_id: {'is_online', 'last_seen'}}; heartbeats still buffered in this worker count too
+    """
+    if not user_ids:
+        return {}
+    cur.execute(
+        "SELECT id, last_seen, NOW()::timestamp AS now FROM users WHERE id = ANY(%s)",
+        (user_ids,)
+    )
+    rows = cur.fetchall()
+    buffered = presence_buffer.pending(user_ids)
+
+    return {row['id']: presence_entry(row['last_seen'], buffered.get(row['id']), row['now'], ttl) for row in rows}
+
+
+def presence_stats() -> Dict[str, Any]:
+    return presence_buffer.stats()
@@ -0,0 +1,101 @@
+import os
+from datetime import datetime
+from typing import Dict, Any, Optional, Tuple
+
+from shared.db import TimedDictCursor, get_connection, is_replica_connection, note_route, release_connection
+from shared.statements import execute_prepared, register_statement
+from shared.timing import register_worker_stats
+from shared.ttl_cache import TTLCache
+
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', '10000'))
+# Each warm worker keeps its own cache and logout only evicts the token on the worker that served it,
+# so a revoked token keeps working on other warm workers for up to this many seconds
+SESSION_CACHE_TTL = float(os.environ.get('SESSION_CACHE_TTL', '30'))
+SESSION_CACHE_NEGATIVE_TTL = float(os.environ.get('SESSION_CACHE_NEGATIVE_TTL', '10'))
+
+SESSION_LOOKUP = register_statement(
+    'session_lookup',
+    """SELECT user_id, expires_at FROM auth_sessions
+    WHERE session_token = $1 AND expires_at > NOW()"""
+)
+
+
+class SessionCache(TTLCache):
+    """
+    Business: Worker cache of session token -> user_id; None marks a token known to be invalid
+    Args: max_size - entries kept before the least recently used is evicted,
+          ttl - seconds a valid token is trusted without hitting the database (never past its expiry),
+          negative_ttl - seconds an unknown or expired token is remembered as invalid
+    """
+
+    def __init__(self, max_size: int = SESSION_CACHE_SIZE, ttl: float = SESSION_CACHE_TTL,
+                 negative_ttl: float = SESSION_CACHE_NEGATIVE_TTL):
+        super().__init__(max_size, ttl)
+        self.negative_ttl = negative_ttl
+        self._stats['negative_hits'] = 0
+
+    def get(self, token: str) -> Tuple[bool, Optional[int]]:
+        """Returns (found, user_id); user_id is None for a cached invalid token (counted in hits and negative_hits)"""
+        found, user_id = super().get(token)
+        if found and user_id is None:
+            self.count('negative_hits')
+        return found, user_id
+
+    def put(self, token: str, user_id: Optional[int], expires_at: Optional[datetime] = None) -> None:
+        if user_id is None:
+            ttl = self.negative_ttl
+        elif expires_at is not None:
+            ttl = min(self.ttl, (expires_at - datetime.now()).total_seconds())
+        else:
+            ttl = self.ttl
+        super().put(token, user_id, ttl)
+
+
+session_cache = SessionCache()
+
+
+def _fetch_session(cur: Any, session_token: str) -> Optional[Dict[str, Any]]:
+    execute_prepared(cur, SESSION_LOOKUP, (session_token,))
+    return cur.fetchone()
+
+
+def resolve_session(cur: Any, session_token: str) -> Optional[int]:
+    """
+    Business: Map a session token to its user id, using the worker cache before the database
+    Args: cur - open cursor (RealDictCursor), session_token - value of X-Session-Token
+    Returns: user id, or None when the token is unknown or expired; a miss on a read replica
+             is confirmed on the primary, since a fresh login may not have replicated yet
+    """
+    found, user_id = session_cache.get(session_token)
+    if found:
+        return user_id
+
+    session = _fetch_session(cur, session_token)
+    if not session and is_replica_connection(cur.connection):
+        note_route('session_retry')
+        conn = get_connection()
+        try:
+            with conn.cursor(cursor_factory=TimedDictCursor) as primary_cur:
+                session = _fetch_session(primary_cur, session_token)
+        finally:
+            release_connection(conn)
+
+    if not session:
+        session_cache.put(session_token, None)
+        return None
+
+    session_cache.put(session_token, session['user_id'], session['expires_at'])
+    return session['user_id']
+
+
+def revoke_session(cur: Any, session_token: str) -> bool:
+    cur.execute("DELETE FROM auth_sessions WHERE session_token = %s", (session_token,))
+    session_cache.invalidate(session_token)
+    return cur.rowcount > 0
+
+
+def session_cache_stats() -> Dict[str, Any]:
+    return session_cache.stats()
+
+
+register_worker_stats('sessions', session_cache_stats)
@@ -0,0 +1,105 @@
+import os
+import re
+import threading
+import weakref
+from typing import Dict, Any, Sequence, Set, Tuple
+
+import psycopg2.errors
+import psycopg2.extensions
+
+PREPARED_STATEMENTS_ENABLED = os.environ.get('DB_PREPARED_STATEMENTS', '1') != '0'
+
+_PLACEHOLDER = re.compile(r'\$(\d+)')
+
+
+class StatementRegistry:
+    """
+    Business: Named hot-path SQL prepared once per connection and executed by name afterwards
+    Args: enabled - when False every call runs the same SQL as an ad-hoc cur.execute
+    """
+
+    def __init__(self, enabled: bool = PREPARED_STATEMENTS_ENABLED):
+        self.enabled = enabled
+        self._statements: Dict[str, Tuple[str, int, str]] = {}
+        self._prepared: 'weakref.WeakKeyDictionary[Any, Set[str]]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self._stats = {'prepares': 0, 'executions': 0, 'adhoc_executions': 0, 'invalidations': 0}
+
+    def register(self, name: str, sql: str) -> str:
+        """
+        Business: Add a statement written with $1..$n placeholders
+        Args: name - SQL identifier used with PREPARE/EXECUTE, sql - statement text
+        Returns: name, so modules can keep it in a constant
+        """
+        numbers = [int(n) for n in _PLACEHOLDER.findall(sql)]
+        adhoc = _PLACEHOLDER.sub(lambda m: f'%(p{m.group(1)})s', sql.replace('%', '%%'))
+        self._statements[name] = (sql, max(numbers, default=0), adhoc)
+        return name
+
+    def statement(self, name: str) -> Tuple[str, int, str]:
+        """Returns (prepared sql, parameter count, equivalent ad-hoc sql with %(pN)s placeholders)"""
+        return self._statements[name]
+
+    def definitions(self) -> Dict[str, str]:
+        return {name: entry[0] for name, entry in self._statements.items()}
+
+    def execute(self, cur: Any, name: str, params: Sequence[Any] = ()) -> None:
+        sql, arity, adhoc = self._statements[name]
+        if len(params) != arity:
+            raise ValueError(f'{name} takes {arity} parameters, got {len(params)}')
+
+        if not self.enabled:
+            self._stats['adhoc_executions'] += 1
+            cur.execute(adhoc, {f'p{i + 1}': value for i, value in enumerate(params)})
+            return
+
+        conn = cur.connection
+        idle = conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        try:
+            self._execute_prepared(cur, conn, name, sql, arity, params)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # the server dropped our statements (DISCARD ALL, pooler reset): forget them and,
+            # if nothing else ran in this transaction yet, prepare again and retry once
+            self.forget(conn)
+            if not idle:
+                raise
+            conn.rollback()
+            self._execute_prepared(cur, conn, name, sql, arity, params)
+
+    def _execute_prepared(self, cur: Any, conn: Any, name: str, sql: str, arity: int,
+                          params: Sequence[Any]) -> None:
+        with self._lock:
+            prepared = self._prepared.setdefault(conn, set())
+        if name not in prepared:
+            cur.execute(f'PREPARE {name} AS {sql}')
+            prepared.add(name)
+            self._stats['prepares'] += 1
+
+        placeholders = ', '.join(['%s'] * arity)
+        cur.execute(f'EXECUTE {name} ({placeholders})' if arity else f'EXECUTE {name}', tuple(params))
+        self._stats['executions'] += 1
+
+    def forget(self, conn: Any) -> None:
+        with self._lock:
+            if self._prepared.pop(conn, None) is not None:
+                self._stats['invalidations'] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            connections = len(self._prepared)
+        return dict(self._stats, statements=len(self._statements), connections=connections)
+
+
+statements = StatementRegistry()
+
+
+def register_statement(name: str, sql: str) -> str:
+    return statements.register(name, sql)
+
+
+def execute_prepared(cur: Any, name: str, params: Sequence[Any] = ()) -> None:
+    statements.execute(cur, name, params)
+
+
+def prepared_statement_stats() -> Dict[str, Any]:
+    return statements.stats()
@@ -0,0 +1,205 @@
+import functools
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, Iterator, Optional
+
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '0'))
+REQUEST_LOG = os.environ.get('REQUEST_LOG', '1') != '0'
+SLOW_QUERY_SQL_LENGTH = 500
+WORKER_STATS_INTERVAL = float(os.environ.get('WORKER_STATS_INTERVAL', '60'))
+
+_WHITESPACE = re.compile(r'\s+')
+_local = threading.local()
+_stats_sources: Dict[str, Callable[[], Dict[str, Any]]] = {}
+_stats_logged_at: Optional[float] = None
+
+
+class RequestTimer:
+    """
+    Business: Per-request breakdown of where the time went (phases, SQL statements, rows fetched)
+    Args: function - function name for the log line, method - HTTP method of the event
+    """
+
+    def __init__(self, function: str, method: str):
+        self.function = function
+        self.method = method
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.fields: Dict[str, Any] = {}
+        self.headers: Dict[str, str] = {}
+        self.queries = 0
+        self.rows = 0
+        self.db_ms = 0.0
+        self.slow_queries = 0
+
+    def add(self, name: str, ms: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    def record_query(self, ms: float, rows: int) -> None:
+        self.queries += 1
+        self.rows += max(rows, 0)
+        self.db_ms += ms
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def header(self, total_ms: float) -> str:
+        metrics = [f'{name};dur={ms:.2f}' for name, ms in self.phases.items()]
+        metrics.append(f'db;dur={self.db_ms:.2f};desc="{self.queries} queries, {self.rows} rows"')
+        metrics.append(f'total;dur={total_ms:.2f}')
+        return ', '.join(metrics)
+
+    def log(self, status: int, total_ms: float, error: Optional[str] = None) -> None:
+        if not REQUEST_LOG:
+            return
+        line = {
+            'event': 'request',
+            'function': self.function,
+            'method': self.method,
+            **self.fields,
+            'status': status,
+            'total_ms': round(total_ms, 2),
+            'phases_ms': {name: round(ms, 2) for name, ms in self.phases.items()},
+            'db_ms': round(self.db_ms, 2),
+            'queries': self.queries,
+            'rows': self.rows
+        }
+        if self.slow_queries:
+            line['slow_queries'] = self.slow_queries
+        worker = worker_stats_due()
+        if worker:
+            line['worker'] = worker
+        if error:
+            line['error'] = error
+        print(json.dumps(line), file=sys.stdout, flush=True)
+
+
+def register_worker_stats(name: str, source: Callable[[], Dict[str, Any]]) -> None:
+    """Include source() under worker.<name> in the request log line (pool, cache and routing counters)"""
+    _stats_sources[name] = source
+
+
+def worker_stats_due() -> Optional[Dict[str, Any]]:
+    """
+    Business: Cumulative counters of this worker, reported on its first request and then at most
+              once per WORKER_STATS_INTERVAL seconds so log lines stay small
+    Returns: {name: stats} from every registered source, or None when not due
+    """
+    global _stats_logged_at
+    now = time.monotonic()
+    if not _stats_sources or (_stats_logged_at is not None and now - _stats_logged_at < WORKER_STATS_INTERVAL):
+        return None
+    _stats_logged_at = now
+    return {name: source() for name, source in _stats_sources.items()}
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return getattr(_local, 'timer', None)
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block of the current request as a named Server-Timing phase"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer = current_timer()
+        if timer is not None:
+            timer.add(name, (time.perf_counter() - started) * 1000)
+
+
+def annotate(**fields: Any) -> None:
+    """Attach fields (e.g. action) to the current request's log line"""
+    timer = current_timer()
+    if timer is not None:
+        timer.fields.update(fields)
+
+
+def set_response_header(name: str, value: str) -> None:
+    """Add a header to the current request's response (e.g. the write position after a commit)"""
+    timer = current_timer()
+    if timer is not None:
+        timer.headers[name] = value
+
+
+def dumps(obj: Any) -> str:
+    """json.dumps timed as the 'serialize' phase"""
+    with phase('serialize'):
+        return json.dumps(obj)
+
+
+def params_shape(params: Any) -> Any:
+    """Types and lengths of query parameters without their values"""
+    if isinstance(params, dict):
+        return {key: params_shape(value) for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        if len(params) > 20 or not isinstance(params, tuple):
+            return f'{type(params).__name__}[{len(params)}]'
+        return [params_shape(value) for value in params]
+    if isinstance(params, (str, bytes)):
+        return f'{type(params).__name__}({len(params)})'
+    return type(params).__name__
+
+
+def log_slow_query(query: Any, params: Any, ms: float) -> None:
+    timer = current_timer()
+    if timer is not None:
+        timer.slow_queries += 1
+    sql = query.decode() if isinstance(query, bytes) else str(query)
+    print(json.dumps({
+        'event': 'slow_query',
+        'function': timer.function if timer else None,
+        **(timer.fields if timer else {}),
+        'ms': round(ms, 2),
+        'sql': _WHITESPACE.sub(' ', sql).strip()[:SLOW_QUERY_SQL_LENGTH],
+        'params': params_shape(params)
+    }), file=sys.stdout, flush=True)
+
+
+def record_query(query: Any, params: Any, ms: float, rows: int) -> None:
+    """Add one statement to the current request and log it when it is over SLOW_QUERY_MS"""
+    timer = current_timer()
+    if timer is not None:
+        timer.record_query(ms, rows)
+    if SLOW_QUERY_MS and ms >= SLOW_QUERY_MS:
+        log_slow_query(query, params, ms)
+
+
+def timed_handler(function: str) -> Callable[[Callable[..., Dict[str, Any]]], Callable[..., Dict[str, Any]]]:
+    """
+    Business: Wrap a cloud function handler with per-request timing
+    Args: function - name used in log lines
+    Returns: decorator adding a Server-Timing header and logging one JSON line per request
+    """
+    def decorate(handler: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        @functools.wraps(handler)
+        def wrapper(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+            timer = RequestTimer(function, event.get('httpMethod', 'TRIGGER'))
+            if event.get('queryStringParameters'):
+                timer.fields['params'] = sorted(event['queryStringParameters'])
+            _local.timer = timer
+            try:
+                response = handler(event, context)
+            except Exception as e:
+                timer.log(500, timer.total_ms(), error=type(e).__name__)
+                raise
+            finally:
+                _local.timer = None
+
+            total_ms = timer.total_ms()
+            timer.log(response['statusCode'], total_ms)
+            headers = dict(response.get('headers') or {}, **timer.headers)
+            headers['Server-Timing'] = timer.header(total_ms)
+            headers['Timing-Allow-Origin'] = '*'
+            exposed = ['Server-Timing', 'ETag'] + list(timer.headers)
+            exposed += [name.strip() for name in headers.get('Access-Control-Expose-Headers', '').split(',')]
+            headers['Access-Control-Expose-Headers'] = ', '.join(dict.fromkeys(name for name in exposed if name))
+            return dict(response, headers=headers)
+        return wrapper
+    return decorate
@@ -0,0 +1,231 @@
+import json
+import time
+from typing import Dict, Any, List, Optional
+from psycopg2.extras import execute_values
+
+from shared.core import constant_response, dispatch_action, get_session_token, json_response
+from shared.db import TimedDictCursor, get_connection, release_connection
+from shared.notify import wait_for_notify
+from shared.sessions import resolve_session
+from shared.statements import execute_prepared, register_statement
+from shared.timing import phase
+
+MAX_WAIT_SECONDS = 25.0
+SIGNAL_TTL_SECONDS = 60
+SWEEP_INTERVAL_SECONDS = 30.0
+SWEEP_BATCH_SIZE = 1000
+MAX_ICE_BATCH = 100
+
+_last_sweep = 0.0
+
+INVALID_SESSION_RESPONSE = constant_response(401, {'error': 'Invalid session'})
+
+SIGNAL_INSERT_SQL = """WITH s AS (
+    INSERT INTO call_signals (from_user_id, to_user_id, signal_type, signal_data)
+    VALUES (%s, %s, %s, %s)
+    RETURNING to_user_id
+)
+SELECT pg_notify('call_signals_' || to_user_id, '') FROM s"""
+
+SIGNAL_BATCH_INSERT_SQL = """WITH s AS (
+    INSERT INTO call_signals (from_user_id, to_user_id, signal_type, signal_data)
+    VALUES %s
+    RETURNING to_user_id
+)
+SELECT pg_notify('call_signals_' || to_user_id, '') FROM (SELECT DISTINCT to_user_id FROM s) t"""
+
+CLAIM_SIGNALS = register_statement(
+    'signals_claim',
+    """DELETE FROM call_signals
+    WHERE id IN (
+        SELECT id FROM call_signals
+        WHERE to_user_id = $1
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, from_user_id, signal_type, signal_data,
+        created_at > NOW() - make_interval(secs => $2) AS is_live"""
+)
+
+CLAIM_SIGNALS_FROM = register_statement(
+    'signals_claim_from',
+    """DELETE FROM call_signals
+    WHERE id IN (
+        SELECT id FROM call_signals
+        WHERE to_user_id = $1 AND from_user_id = $3
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, from_user_id, signal_type, signal_data,
+        created_at > NOW() - make_interval(secs => $2) AS is_live"""
+)
+
+def claim_signals(conn: Any, cur: Any, user_id: int, from_user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Business: Atomically take queued signals for the user off the queue
+    Args: conn - pooled connection, cur - its cursor, user_id - recipient,
+          from_user_id - only claim signals from this peer, leaving the rest queued
+    Returns: signals younger than SIGNAL_TTL_SECONDS, oldest first; expired ones are dropped
+    """
+    if from_user_id is None:
+        execute_prepared(cur, CLAIM_SIGNALS, (user_id, SIGNAL_TTL_SECONDS))
+    else:
+        execute_prepared(cur, CLAIM_SIGNALS_FROM, (user_id, SIGNAL_TTL_SECONDS, from_user_id))
+    signals = sorted((s for s in cur.fetchall() if s['is_live']), key=lambda s: s['id'])
+    conn.commit()
+    return signals
+
+def sweep_expired_signals(cur: Any) -> None:
+    global _last_sweep
+    now = time.monotonic()
+    if now - _last_sweep < SWEEP_INTERVAL_SECONDS:
+        return
+    _last_sweep = now
+    cur.execute(
+        """DELETE FROM call_signals
+        WHERE id IN (
+            SELECT id FROM call_signals
+            WHERE created_at < NOW() - make_interval(secs => %s)
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )""",
+        (SIGNAL_TTL_SECONDS, SWEEP_BATCH_SIZE)
+    )
+
+def wait_for_signals(conn: Any, cur: Any, user_id: int, wait: float,
+                     from_user_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Business: Long-poll for signals, waking on pg_notify from the sender's insert
+    Args: conn - pooled connection, cur - its cursor, user_id - recipient, wait - max seconds to block
+    Returns: claimed signals, empty if none arrived before the deadline
+    """
+    channel = f'call_signals_{int(user_id)}'
+    deadline = time.monotonic() + wait
+    
+    cur.execute(f'LISTEN {channel}')
+    conn.commit()
+    try:
+        signals = claim_signals(conn, cur, user_id, from_user_id)
+        while not signals and wait_for_notify(conn, deadline - time.monotonic()):
+            signals = claim_signals(conn, cur, user_id, from_user_id)
+    finally:
+        cur.execute(f'UNLISTEN {channel}')
+        conn.commit()
+        conn.notifies.clear()
+    return signals
+
+def send_offer(conn: Any, cur: Any, user_id: int, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    target_user_id = body_data.get('target_user_id')
+    offer = body_data.get('offer')
+    
+    sweep_expired_signals(cur)
+    cur.execute(
+        SIGNAL_INSERT_SQL,
+        (user_id, target_user_id, 'offer', json.dumps(offer))
+    )
+    conn.commit()
+    
+    return json_response(200, {'success': True, 'message': 'Offer sent'})
+
+def send_answer(conn: Any, cur: Any, user_id: int, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    target_user_id = body_data.get('target_user_id')
+    answer = body_data.get('answer')
+    
+    sweep_expired_signals(cur)
+    cur.execute(
+        SIGNAL_INSERT_SQL,
+        (user_id, target_user_id, 'answer', json.dumps(answer))
+    )
+    conn.commit()
+    
+    return json_response(200, {'success': True, 'message': 'Answer sent'})
+
+def send_ice_candidate(conn: Any, cur: Any, user_id: int, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    target_user_id = body_data.get('target_user_id')
+    candidate = body_data.get('candidate')
+    
+    sweep_expired_signals(cur)
+    cur.execute(
+        SIGNAL_INSERT_SQL,
+        (user_id, target_user_id, 'ice', json.dumps(candidate))
+    )
+    conn.commit()
+    
+    return json_response(200, {'success': True, 'message': 'ICE candidate sent'})
+
+def send_ice_candidates(conn: Any, cur: Any, user_id: int, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    target_user_id = body_data.get('target_user_id')
+    candidates = body_data.get('candidates') or []
+    
+    if not isinstance(candidates, list) or len(candidates) > MAX_ICE_BATCH:
+        return json_response(400, {'error': f'candidates must be a list of at most {MAX_ICE_BATCH} items'})
+    
+    if candidates:
+        sweep_expired_signals(cur)
+        execute_values(
+            cur,
+            SIGNAL_BATCH_INSERT_SQL,
+            [(user_id, target_user_id, 'ice', json.dumps(c)) for c in candidates]
+        )
+        conn.commit()
+    
+    return json_response(200, {'success': True, 'message': 'ICE candidates sent', 'count': len(candidates)})
+
+def poll_signals(conn: Any, cur: Any, user_id: int, params: Dict[str, str]) -> Dict[str, Any]:
+    try:
+        wait = min(max(float(params.get('wait') or 0), 0.0), MAX_WAIT_SECONDS)
+    except ValueError:
+        wait = 0.0
+    
+    try:
+        from_user_id = int(params['from_user_id']) if params.get('from_user_id') else None
+    except ValueError:
+        return json_response(400, {'error': 'Invalid from_user_id'})
+    
+    if wait > 0:
+        signals = wait_for_signals(conn, cur, user_id, wait, from_user_id)
+    else:
+        signals = claim_signals(conn, cur, user_id, from_user_id)
+    
+    return json_response(200, {
+        'success': True,
+        'signals': [{
+            'from_user_id': s['from_user_id'],
+            'signal_type': s['signal_type'],
+            'signal_data': json.loads(s['signal_data'])
+        } for s in signals]
+    })
+
+ACTIONS = {
+    'offer': send_offer,
+    'answer': send_answer,
+    'ice_candidate': send_ice_candidate,
+    'ice_candidates': send_ice_candidates
+}
+
+def handle(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Business: WebRTC signaling server for peer-to-peer calls
+    Args: event with httpMethod GET or POST, body, headers; OPTIONS and missing tokens are answered by index.py
+    Returns: HTTP response with signaling data
+    """
+    method: str = event.get('httpMethod', 'GET')
+    session_token = get_session_token(event)
+    
+    with phase('connect'):
+        conn = get_connection()
+    
+    try:
+        with conn.cursor(cursor_factory=TimedDictCursor) as cur:
+            with phase('session'):
+                user_id = resolve_session(cur, session_token)
+            
+            if user_id is None:
+                return INVALID_SESSION_RESPONSE
+            
+            if method == 'POST':
+                body_data = json.loads(event.get('body', '{}'))
+                return dispatch_action(ACTIONS, body_data.get('action'), conn, cur, user_id, body_data)
+            
+            return poll_signals(conn, cur, user_id, event.get('queryStringParameters') or {})
+    
+    finally:
+        release_connection(conn)
@@ -0,0 +1,149 @@
+"""
+Business: Measure cold starts of the cloud functions, each run in a fresh Python process
+Args: DATABASE_URL pointing at a migrated database; --runs, --compare, --threshold
+Returns: median/max of index.py import, first OPTIONS, first missing-token 401, first authenticated
+         request (which imports handlers.py and connects) and the warm request after it,
+         saved as JSON under benchmarks/results/
+
+Usage: DATABASE_URL=postgresql://... python benchmarks/cold_start.py --runs 10
+"""
+import argparse
+import json
+import os
+import secrets
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, Any, List
+
+import psycopg2
+
+from load import BACKEND, RESULTS_DIR, compare, environment
+
+FUNCTIONS = {
+    'auth': {'httpMethod': 'GET'},
+    'messages': {'httpMethod': 'GET'},
+    'signaling': {'httpMethod': 'GET'}
+}
+PHASES = ('import', 'options', 'unauthorized', 'first_request', 'warm_request')
+COLD_START_METRICS = (('p50_ms', 1), ('max_ms', 1))
+
+CHILD = """
+import importlib.util, json, sys, time
+path, event = sys.argv[1], json.loads(sys.argv[2])
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location('index', path)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+marks = {'import': time.perf_counter()}
+module.handler({'httpMethod': 'OPTIONS', 'headers': {}}, None)
+marks['options'] = time.perf_counter()
+module.handler({'httpMethod': event['httpMethod'], 'headers': {}}, None)
+marks['unauthorized'] = time.perf_counter()
+driver_loaded = 'psycopg2' in sys.modules
+statuses = [module.handler(event, None)['statusCode']]
+marks['first_request'] = time.perf_counter()
+statuses.append(module.handler(event, None)['statusCode'])
+marks['warm_request'] = time.perf_counter()
+previous, timings = started, {}
+for name, mark in marks.items():
+    timings[name] = (mark - previous) * 1000
+    previous = mark
+print(json.dumps({'timings': timings, 'statuses': statuses, 'driver_loaded_before_auth': driver_loaded}))
+"""
+
+
+def run_once(function: str, event: Dict[str, Any]) -> Dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, os.path.join(BACKEND, function, 'index.py'), json.dumps(event)],
+        env=dict(os.environ, REQUEST_LOG='0'), capture_output=True, text=True, check=True
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def seed(conn: Any) -> Dict[str, Any]:
+    tag = secrets.token_hex(4)
+    with conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO users (phone_number, username) VALUES (%s, %s) RETURNING id",
+            (f'+71{int(tag, 16) % 10 ** 9:09d}', f'cold_{tag}')
+        )
+        user_id = cur.fetchone()[0]
+        session_token = secrets.token_urlsafe(32)
+        cur.execute(
+            "INSERT INTO auth_sessions (user_id, session_token, expires_at) VALUES (%s, %s, NOW() + INTERVAL '1 day')",
+            (user_id, session_token)
+        )
+    conn.commit()
+    return {'user_id': user_id, 'session_token': session_token}
+
+
+def cleanup(conn: Any, data: Dict[str, Any]) -> None:
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM auth_sessions WHERE user_id = %s", (data['user_id'],))
+        cur.execute("DELETE FROM users WHERE id = %s", (data['user_id'],))
+    conn.commit()
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {'p50_ms': statistics.median(samples), 'max_ms': max(samples), 'min_ms': min(samples)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1].strip())
+    parser.add_argument('--runs', type=int, default=10, help='fresh processes per function')
+    parser.add_argument('--output', help=f'result file (default: {os.path.relpath(RESULTS_DIR)}/cold-start-<time>-<rev>.json)')
+    parser.add_argument('--compare', help='saved cold-start result to compare with')
+    parser.add_argument('--threshold', type=float, default=20.0, help='percent change that counts as a regression')
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        data = seed(conn)
+        try:
+            report = {
+                'started_at': datetime.now().isoformat(timespec='seconds'),
+                'environment': environment(conn),
+                'args': vars(args),
+                'scenarios': {}
+            }
+            print(f"{'function.phase':<26}{'p50 ms':>9}{'min ms':>9}{'max ms':>9}")
+            for function, event in FUNCTIONS.items():
+                event = dict(event, headers={'X-Session-Token': data['session_token']})
+                runs = [run_once(function, event) for _ in range(args.runs)]
+                failed = [run['statuses'] for run in runs if any(status != 200 for status in run['statuses'])]
+                if failed:
+                    sys.exit(f'{function}: unexpected statuses {failed[0]}')
+                if any(run['driver_loaded_before_auth'] for run in runs):
+                    print(f'{function}: psycopg2 was imported before the first authenticated request')
+                for phase in PHASES:
+                    result = summarize([run['timings'][phase] for run in runs])
+                    report['scenarios'][f'{function}.{phase}'] = result
+                    print(f"{function + '.' + phase:<26}{result['p50_ms']:>9.2f}{result['min_ms']:>9.2f}"
+                          f"{result['max_ms']:>9.2f}")
+        finally:
+            cleanup(conn, data)
+    finally:
+        conn.close()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR,
+        f"cold-start-{datetime.now():%Y%m%d-%H%M%S}-{report['environment']['git_revision'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nsaved {os.path.relpath(output)}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = dict(json.load(f), path=args.compare)
+        regressions = compare(report, baseline, args.threshold, COLD_START_METRICS)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:g}%: " + '; '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,481 @@
+"""
+Business: Load-test the function handlers in-process against a seeded local Postgres
+Args: DATABASE_URL pointing at a migrated database; --users, --messages, --concurrency, --requests, ...
+Returns: p50/p95/p99 latency, throughput and queries per request for each scenario,
+         saved as JSON under benchmarks/results/ and optionally compared with a baseline run
+
+Usage: DATABASE_URL=postgresql://... python benchmarks/load.py --concurrency 8 --requests 500
+       python benchmarks/load.py --compare benchmarks/results/<baseline>.json --threshold 10
+"""
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import random
+import secrets
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+FUNCTIONS = ('auth', 'messages', 'signaling')
+SEARCH_WORDS = ('hello', 'meeting', 'tomorrow', 'photo', 'call', 'weekend')
+COMPARED_METRICS = (('p50_ms', 1), ('p95_ms', 1), ('p99_ms', 1), ('rps', -1), ('queries', 1))
+
+sys.path.insert(0, BACKEND)
+
+import psycopg2
+import psycopg2.extensions
+
+_query_counter = threading.local()
+
+
+class CountingCursorMixin:
+    def execute(self, query: Any, vars: Any = None) -> Any:
+        _query_counter.count = getattr(_query_counter, 'count', 0) + 1
+        return super().execute(query, vars)
+
+    def executemany(self, query: Any, vars_list: Any) -> Any:
+        _query_counter.count = getattr(_query_counter, 'count', 0) + 1
+        return super().executemany(query, vars_list)
+
+
+class CountingConnection(psycopg2.extensions.connection):
+    """Connection whose cursors (of any cursor_factory) count statements sent by the current thread"""
+
+    _factories: Dict[type, type] = {}
+
+    def cursor(self, *args: Any, **kwargs: Any) -> Any:
+        base = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        factory = self._factories.get(base)
+        if factory is None:
+            factory = self._factories[base] = type(f'Counting{base.__name__}', (CountingCursorMixin, base), {})
+        kwargs['cursor_factory'] = factory
+        return super().cursor(*args, **kwargs)
+
+
+def load_handlers(pool_size: int) -> Dict[str, Callable[[Dict[str, Any], Any], Dict[str, Any]]]:
+    """Import each function's index.py and route the shared pools through CountingConnection"""
+    os.environ.setdefault('DB_POOL_MAX_SIZE', str(pool_size))
+    os.environ.setdefault('REQUEST_LOG', '0')
+    handlers = {}
+    for name in FUNCTIONS:
+        spec = importlib.util.spec_from_file_location(f'load_{name}', os.path.join(BACKEND, name, 'index.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        handlers[name] = module.handler
+
+    from shared.db import get_pool, get_replica_pool
+    for pool in (get_pool(), get_replica_pool()):
+        if pool is not None:
+            pool.connect_kwargs['connection_factory'] = CountingConnection
+    return handlers
+
+
+def seed(conn: Any, args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Business: Bulk-insert a tagged data set: users with sessions, private chats with skewed lengths,
+              large groups and a call_signals backlog that is mostly past its TTL
+    Returns: ids and session tokens the scenarios draw from
+    """
+    tag = secrets.token_hex(4)
+    with conn.cursor() as cur:
+        cur.execute("SELECT setseed(%s)", (args.seed / 2 ** 31,))
+        cur.execute(
+            """INSERT INTO users (phone_number, username, last_seen)
+            SELECT '+70' || %s || lpad(g::text, 7, '0'), 'load_' || %s || '_' || g, NOW()
+            FROM generate_series(1, %s) g
+            ORDER BY g
+            RETURNING id""",
+            (int(tag, 16) % 1000, tag, args.users)
+        )
+        user_ids = [row[0] for row in cur.fetchall()]
+        cur.execute(
+            """INSERT INTO auth_sessions (user_id, session_token, expires_at)
+            SELECT id, %s || '-' || md5(%s || id::text), NOW() + INTERVAL '1 day' FROM unnest(%s::integer[]) id
+            RETURNING user_id, session_token""",
+            (tag, tag, user_ids)
+        )
+        tokens = dict(cur.fetchall())
+
+        pairs = sorted({
+            (min(a, b), max(a, b))
+            for i, a in enumerate(user_ids)
+            for b in user_ids[i + 1:i + 1 + args.contacts]
+        })
+        cur.execute(
+            """INSERT INTO chats (type, pair_user_low, pair_user_high)
+            SELECT 'private', low, high FROM unnest(%s::integer[], %s::integer[]) AS p(low, high)
+            RETURNING id, pair_user_low, pair_user_high""",
+            ([p[0] for p in pairs], [p[1] for p in pairs])
+        )
+        private_chats = cur.fetchall()
+        cur.execute(
+            """INSERT INTO chat_participants (chat_id, user_id)
+            SELECT chat_id, unnest(ARRAY[low, high]) FROM unnest(%s::integer[], %s::integer[], %s::integer[])
+                AS c(chat_id, low, high)""",
+            ([c[0] for c in private_chats], [c[1] for c in private_chats], [c[2] for c in private_chats])
+        )
+
+        group_ids = []
+        rng = random.Random(args.seed)
+        for n in range(args.groups):
+            members = sorted(rng.sample(user_ids, min(args.group_size, len(user_ids))))
+            cur.execute(
+                """WITH c AS (
+                    INSERT INTO chats (type, name, created_by) VALUES ('group', %s, %s) RETURNING id
+                )
+                INSERT INTO chat_participants (chat_id, user_id, is_admin)
+                SELECT c.id, member, member = %s FROM c, unnest(%s::integer[]) member
+                RETURNING chat_id""",
+                (f'load group {n}', members[0], members[0], members)
+            )
+            group_ids.append(cur.fetchone()[0])
+
+        # power(random(), 3) sends most messages to a few long chats, like real traffic
+        cur.execute(
+            """WITH c AS (
+                SELECT array_agg(id ORDER BY id) AS ids FROM chats WHERE id = ANY(%s)
+            ), picked AS (
+                SELECT g, c.ids[1 + floor(power(random(), 3) * array_length(c.ids, 1))::int] AS chat_id
+                FROM c, generate_series(1, %s) g
+            )
+            INSERT INTO messages (chat_id, sender_id, content, type, created_at)
+            SELECT p.chat_id, s.user_id,
+                (ARRAY['hello', 'see you tomorrow', 'meeting at 10', 'sent a photo', 'call me', 'weekend plans'])
+                    [1 + (g %% 6)] || ' #' || g,
+                'text', NOW() - (%s - g) * INTERVAL '2 seconds'
+            FROM picked p
+            CROSS JOIN LATERAL (
+                SELECT user_id FROM chat_participants cp
+                WHERE cp.chat_id = p.chat_id ORDER BY random() + g * 0 LIMIT 1
+            ) s
+            ORDER BY g""",
+            ([c[0] for c in private_chats] + group_ids, args.messages, args.messages)
+        )
+        chat_ids = [c[0] for c in private_chats] + group_ids
+        cur.execute(
+            """UPDATE chats c
+            SET last_message_id = m.last_id, last_message_at = m.last_at, message_count = m.n,
+                last_message_preview = LEFT(m.content, 200), updated_at = m.last_at
+            FROM (
+                SELECT DISTINCT ON (chat_id) chat_id, id AS last_id, created_at AS last_at, content,
+                    COUNT(*) OVER (PARTITION BY chat_id) AS n
+                FROM messages WHERE chat_id = ANY(%s)
+                ORDER BY chat_id, id DESC
+            ) m
+            WHERE c.id = m.chat_id""",
+            (chat_ids,)
+        )
+        cur.execute(
+            """UPDATE chat_participants cp
+            SET last_read_message_id = COALESCE(c.last_message_id, 0), read_count = c.message_count
+            FROM chats c WHERE c.id = cp.chat_id AND c.id = ANY(%s)""",
+            (chat_ids,)
+        )
+
+        cur.execute(
+            """INSERT INTO call_signals (from_user_id, to_user_id, signal_type, signal_data, created_at)
+            SELECT u[1 + floor(random() * array_length(u, 1))::int], u[1 + floor(random() * array_length(u, 1))::int],
+                'ice_candidate', '{"candidate": "candidate:1 1 udp 2122260223 10.0.0.1 54400 typ host"}',
+                NOW() - random() * INTERVAL '1 hour'
+            FROM (SELECT %s::integer[] AS u) users, generate_series(1, %s)""",
+            (user_ids, args.signals)
+        )
+    conn.commit()
+
+    chats_by_user: Dict[int, List[int]] = {}
+    peers_by_chat = {}
+    for chat_id, low, high in private_chats:
+        chats_by_user.setdefault(low, []).append(chat_id)
+        chats_by_user.setdefault(high, []).append(chat_id)
+        peers_by_chat[chat_id] = (low, high)
+    with conn.cursor() as cur:
+        cur.execute("SELECT chat_id, user_id FROM chat_participants WHERE chat_id = ANY(%s)", (group_ids,))
+        group_members: Dict[int, List[int]] = {}
+        for chat_id, user_id in cur.fetchall():
+            group_members.setdefault(chat_id, []).append(user_id)
+    conn.commit()
+    return {
+        'tag': tag,
+        'user_ids': user_ids,
+        'tokens': tokens,
+        'chat_ids': chat_ids,
+        'chats_by_user': chats_by_user,
+        'peers_by_chat': peers_by_chat,
+        'group_members': group_members
+    }
+
+
+def cleanup(conn: Any, data: Dict[str, Any]) -> None:
+    with conn.cursor() as cur:
+        cur.execute("DELETE FROM message_client_ids WHERE chat_id = ANY(%s)", (data['chat_ids'],))
+        cur.execute("DELETE FROM messages WHERE chat_id = ANY(%s)", (data['chat_ids'],))
+        cur.execute("DELETE FROM chat_participants WHERE chat_id = ANY(%s)", (data['chat_ids'],))
+        cur.execute("DELETE FROM chats WHERE id = ANY(%s)", (data['chat_ids'],))
+        cur.execute("DELETE FROM call_signals WHERE to_user_id = ANY(%s)", (data['user_ids'],))
+        cur.execute("DELETE FROM auth_sessions WHERE user_id = ANY(%s)", (data['user_ids'],))
+        cur.execute("DELETE FROM users WHERE id = ANY(%s)", (data['user_ids'],))
+    conn.commit()
+
+
+def request(method: str, token: str, body: Optional[Dict[str, Any]] = None,
+            params: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    event = {
+        'httpMethod': method,
+        'headers': {'X-Session-Token': token},
+        'queryStringParameters': params
+    }
+    if body is not None:
+        event['body'] = json.dumps(body)
+    return event
+
+
+def scenarios(data: Dict[str, Any]) -> Dict[str, Tuple[str, Callable[[random.Random], Dict[str, Any]]]]:
+    """name -> (function, event factory); factories draw a random seeded user per request"""
+    users = [user_id for user_id in data['user_ids'] if data['chats_by_user'].get(user_id)]
+    groups = sorted(data['group_members'])
+
+    def private_chat(rng: random.Random) -> Tuple[int, str, int]:
+        user_id = rng.choice(users)
+        chat_id = rng.choice(data['chats_by_user'][user_id])
+        low, high = data['peers_by_chat'][chat_id]
+        return chat_id, data['tokens'][user_id], high if user_id == low else low
+
+    def group_chat(rng: random.Random) -> Tuple[int, str]:
+        chat_id = rng.choice(groups)
+        return chat_id, data['tokens'][rng.choice(data['group_members'][chat_id])]
+
+    def send(rng: random.Random) -> Dict[str, Any]:
+        chat_id, token, _ = private_chat(rng)
+        return request('POST', token, {'action': 'send', 'chat_id': chat_id, 'content': 'load test message'})
+
+    def send_batch(rng: random.Random) -> Dict[str, Any]:
+        chat_id, token, _ = private_chat(rng)
+        return request('POST', token, {'action': 'send_batch', 'messages': [
+            {'chat_id': chat_id, 'content': f'offline message {i}', 'client_id': secrets.token_hex(8)}
+            for i in range(20)
+        ]})
+
+    def send_group(rng: random.Random) -> Dict[str, Any]:
+        chat_id, token = group_chat(rng)
+        return request('POST', token, {'action': 'send', 'chat_id': chat_id, 'content': 'hi everyone'})
+
+    def mark_read(rng: random.Random) -> Dict[str, Any]:
+        chat_id, token, _ = private_chat(rng)
+        return request('POST', token, {'action': 'mark_read', 'chat_id': chat_id})
+
+    def chat_list(rng: random.Random) -> Dict[str, Any]:
+        return request('GET', private_chat(rng)[1])
+
+    def history(rng: random.Random) -> Dict[str, Any]:
+        chat_id, token, _ = private_chat(rng)
+        return request('GET', token, params={'chat_id': str(chat_id), 'limit': '50'})
+
+    def delta(rng: random.Random) -> Dict[str, Any]:
+        chat_id, token, _ = private_chat(rng)
+        return request('GET', token, params={'chat_id': str(chat_id), 'after_id': '0', 'limit': '100'})
+
+    def search(rng: random.Random) -> Dict[str, Any]:
+        return request('GET', private_chat(rng)[1], params={'q': rng.choice(SEARCH_WORDS)})
+
+    def me(rng: random.Random) -> Dict[str, Any]:
+        return request('GET', private_chat(rng)[1])
+
+    def offer(rng: random.Random) -> Dict[str, Any]:
+        _, token, peer = private_chat(rng)
+        return request('POST', token, {'action': 'offer', 'target_user_id': peer,
+                                       'offer': {'type': 'offer', 'sdp': 'v=0'}})
+
+    def ice_candidates(rng: random.Random) -> Dict[str, Any]:
+        _, token, peer = private_chat(rng)
+        return request('POST', token, {'action': 'ice_candidates', 'target_user_id': peer,
+                                       'candidates': [{'candidate': f'candidate:{i}'} for i in range(10)]})
+
+    def poll_signals(rng: random.Random) -> Dict[str, Any]:
+        return request('GET', private_chat(rng)[1])
+
+    return {
+        'auth.me': ('auth', me),
+        'messages.chat_list': ('messages', chat_list),
+        'messages.history': ('messages', history),
+        'messages.delta': ('messages', delta),
+        'messages.search': ('messages', search),
+        'messages.send': ('messages', send),
+        'messages.send_batch': ('messages', send_batch),
+        'messages.send_group': ('messages', send_group),
+        'messages.mark_read': ('messages', mark_read),
+        'signaling.offer': ('signaling', offer),
+        'signaling.ice_candidates': ('signaling', ice_candidates),
+        'signaling.poll': ('signaling', poll_signals)
+    }
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(handler: Callable[[Dict[str, Any], Any], Dict[str, Any]], events: List[Dict[str, Any]],
+                 concurrency: int, warmup: int) -> Dict[str, Any]:
+    """Replay pre-built events from `concurrency` threads; the first `warmup` are not measured"""
+    def call(event: Dict[str, Any]) -> Tuple[float, int, int]:
+        _query_counter.count = 0
+        started = time.perf_counter()
+        response = handler(event, None)
+        return (time.perf_counter() - started) * 1000, response['statusCode'], _query_counter.count
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, events[:warmup]))
+        started = time.perf_counter()
+        samples = list(executor.map(call, events[warmup:]))
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(sample[0] for sample in samples)
+    statuses: Dict[str, int] = {}
+    for _, status, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for _, status, _ in samples if status >= 400),
+        'statuses': statuses,
+        'rps': len(samples) / elapsed if elapsed else 0.0,
+        'mean_ms': sum(latencies) / len(latencies),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1],
+        'queries': sum(sample[2] for sample in samples) / len(samples)
+    }
+
+
+def environment(conn: Any) -> Dict[str, Any]:
+    with conn.cursor() as cur:
+        cur.execute("SHOW server_version")
+        server_version = cur.fetchone()[0]
+    conn.commit()
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    return {
+        'git_revision': revision,
+        'python': platform.python_version(),
+        'postgres': server_version,
+        'host': platform.node()
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any], threshold: float,
+            metrics: Tuple[Tuple[str, int], ...] = COMPARED_METRICS) -> List[str]:
+    """
+    Business: Print per-metric change against a saved run
+    Args: metrics - (name, direction) pairs; direction 1 means higher is worse, -1 lower is worse
+    Returns: the regressions beyond threshold percent
+    """
+    regressions = []
+    print(f"\n{'vs ' + os.path.basename(baseline['path']):<26}" + ''.join(f'{m:>12}' for m, _ in metrics))
+    for name, result in report['scenarios'].items():
+        before = baseline['scenarios'].get(name)
+        if not before:
+            continue
+        cells = []
+        for metric, direction in metrics:
+            if not before[metric]:
+                cells.append(f"{'-':>12}")
+                continue
+            change = (result[metric] - before[metric]) / before[metric] * 100
+            worse = change * direction > threshold
+            if worse:
+                regressions.append(f'{name} {metric} {change:+.1f}%')
+            cells.append(f"{change:>+10.1f}%{'!' if worse else ' '}")
+        print(f'{name:<26}' + ''.join(cells))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1].strip())
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--contacts', type=int, default=10, help='private chats started by each user')
+    parser.add_argument('--messages', type=int, default=200000, help='messages spread over all chats')
+    parser.add_argument('--groups', type=int, default=5)
+    parser.add_argument('--group-size', type=int, default=500)
+    parser.add_argument('--signals', type=int, default=100000, help='call_signals backlog, mostly expired')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=500, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--scenario', action='append', help='run only these scenarios (repeatable)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help=f'result file (default: {os.path.relpath(RESULTS_DIR, ROOT)}/<time>-<rev>.json)')
+    parser.add_argument('--compare', help='saved result to compare with')
+    parser.add_argument('--threshold', type=float, default=10.0, help='percent change that counts as a regression')
+    parser.add_argument('--keep', action='store_true', help='leave the seeded rows in the database')
+    args = parser.parse_args()
+
+    handlers = load_handlers(args.concurrency)
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        started = time.perf_counter()
+        data = seed(conn, args)
+        print(f"seeded {len(data['user_ids'])} users, {len(data['chat_ids'])} chats, {args.messages} messages, "
+              f"{args.signals} signals in {time.perf_counter() - started:.1f}s")
+        try:
+            available = scenarios(data)
+            names = args.scenario or list(available)
+            unknown = [name for name in names if name not in available]
+            if unknown:
+                parser.error(f"unknown scenario(s) {', '.join(unknown)}; choose from {', '.join(available)}")
+
+            rng = random.Random(args.seed)
+            report = {
+                'started_at': datetime.now().isoformat(timespec='seconds'),
+                'environment': environment(conn),
+                'args': vars(args),
+                'scenarios': {}
+            }
+            print(f"{'scenario':<26}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}{'errors':>8}")
+            for name in names:
+                function, factory = available[name]
+                events = [factory(rng) for _ in range(args.warmup + args.requests)]
+                result = run_scenario(handlers[function], events, args.concurrency, args.warmup)
+                report['scenarios'][name] = result
+                print(
+                    f"{name:<26}{result['rps']:>9.0f}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                    f"{result['p99_ms']:>9.2f}{result['queries']:>9.1f}{result['errors']:>8}"
+                )
+        finally:
+            if not args.keep:
+                cleanup(conn, data)
+    finally:
+        conn.close()
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{report['environment']['git_revision'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nsaved {os.path.relpath(output)}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = dict(json.load(f), path=args.compare)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:g}%: " + '; '.join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Business: Compare ad-hoc cur.execute against per-connection prepared statements for the hot queries
+Args: DATABASE_URL pointing at a migrated database; --iterations, --chats
+Returns: planning time and throughput per statement printed as a table (or JSON with --json)
+
+Usage: DATABASE_URL=postgresql://... python benchmarks/prepared_statements.py --iterations 2000
+"""
+import argparse
+import importlib.util
+import json
+import os
+import re
+import secrets
+import sys
+import time
+from typing import Dict, Any, List, Tuple
+
+BACKEND = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+sys.path.insert(0, BACKEND)
+
+import psycopg2
+
+from shared.statements import StatementRegistry, statements
+
+PLANNING_TIME = re.compile(r'Planning Time: ([\d.]+) ms')
+
+
+def load_handlers() -> None:
+    """Import the function implementations so their statements register themselves"""
+    for name in ('messages', 'signaling'):
+        spec = importlib.util.spec_from_file_location(f'bench_{name}', os.path.join(BACKEND, name, 'index.py'))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.function.load()
+
+
+def seed(cur: Any, chats: int) -> Dict[str, Any]:
+    tag = secrets.token_hex(4)
+    cur.execute(
+        """INSERT INTO users (phone_number, username)
+        SELECT '+7999' || %s || lpad(g::text, 4, '0'), 'bench_' || %s || '_' || g
+        FROM generate_series(0, %s) g
+        RETURNING id""",
+        (int(tag, 16) % 1000, tag, chats)
+    )
+    user_ids = [row[0] for row in cur.fetchall()]
+    owner, peers = user_ids[0], user_ids[1:]
+    session_token = secrets.token_urlsafe(32)
+    cur.execute(
+        "INSERT INTO auth_sessions (user_id, session_token, expires_at) VALUES (%s, %s, NOW() + INTERVAL '1 day')",
+        (owner, session_token)
+    )
+    chat_ids = []
+    for peer in peers:
+        cur.execute(
+            """INSERT INTO chats (type, pair_user_low, pair_user_high) VALUES ('private', LEAST(%s, %s), GREATEST(%s, %s))
+            RETURNING id""",
+            (owner, peer, owner, peer)
+        )
+        chat_id = cur.fetchone()[0]
+        chat_ids.append(chat_id)
+        cur.execute(
+            "INSERT INTO chat_participants (chat_id, user_id) VALUES (%s, %s), (%s, %s)",
+            (chat_id, owner, chat_id, peer)
+        )
+    return {'owner': owner, 'user_ids': user_ids, 'session_token': session_token, 'chat_ids': chat_ids}
+
+
+def cleanup(cur: Any, data: Dict[str, Any]) -> None:
+    cur.execute("DELETE FROM messages WHERE chat_id = ANY(%s)", (data['chat_ids'],))
+    cur.execute("DELETE FROM chat_participants WHERE chat_id = ANY(%s)", (data['chat_ids'],))
+    cur.execute("DELETE FROM chats WHERE id = ANY(%s)", (data['chat_ids'],))
+    cur.execute("DELETE FROM auth_sessions WHERE user_id = %s", (data['owner'],))
+    cur.execute("DELETE FROM users WHERE id = ANY(%s)", (data['user_ids'],))
+
+
+def workload(data: Dict[str, Any]) -> List[Tuple[str, Tuple[Any, ...], bool]]:
+    """(statement, params, writes); writes are rolled back after each run"""
+    return [
+        ('session_lookup', (data['session_token'],), False),
+        ('messages_chat_list', (data['owner'],), False),
+        ('messages_send', (data['chat_ids'][0], data['owner'], 'benchmark message', 'text', 200, None), True),
+        ('signals_claim', (data['owner'], 60), True),
+    ]
+
+
+def planning_ms(cur: Any, registry: StatementRegistry, name: str, params: Tuple[Any, ...]) -> float:
+    _, arity, adhoc = registry.statement(name)
+    if registry.enabled:
+        registry.execute(cur, name, params)
+        cur.fetchall()
+        cur.execute(f'EXPLAIN (ANALYZE, SUMMARY) EXECUTE {name} ({", ".join(["%s"] * arity)})', params)
+    else:
+        cur.execute('EXPLAIN (ANALYZE, SUMMARY) ' + adhoc, {f'p{i + 1}': v for i, v in enumerate(params)})
+    plan = '\n'.join(row[0] for row in cur.fetchall())
+    match = PLANNING_TIME.search(plan)
+    return float(match.group(1)) if match else 0.0
+
+
+def run(conn: Any, registry: StatementRegistry, data: Dict[str, Any], iterations: int) -> Dict[str, Dict[str, float]]:
+    results = {}
+    with conn.cursor() as cur:
+        for name, params, writes in workload(data):
+            # warm up: first PREPARE and the first few custom plans before the generic one is cached
+            for _ in range(10):
+                registry.execute(cur, name, params)
+                cur.fetchall()
+                conn.rollback()
+
+            plans = []
+            for _ in range(20):
+                plans.append(planning_ms(cur, registry, name, params))
+                conn.rollback()
+
+            started = time.perf_counter()
+            for _ in range(iterations):
+                registry.execute(cur, name, params)
+                cur.fetchall()
+                if writes:
+                    conn.rollback()
+            conn.rollback()
+            elapsed = time.perf_counter() - started
+
+            plans.sort()
+            results[name] = {
+                'planning_ms': plans[len(plans) // 2],
+                'ops_per_sec': iterations / elapsed,
+                'mean_us': elapsed / iterations * 1e6
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1].strip())
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--chats', type=int, default=50, help='chats in the seeded user\'s chat list')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    load_handlers()
+    definitions = statements.definitions()
+    registries = {}
+    for mode, enabled in (('adhoc', False), ('prepared', True)):
+        registries[mode] = StatementRegistry(enabled=enabled)
+        for name, sql in definitions.items():
+            registries[mode].register(name, sql)
+
+    conn = psycopg2.connect(os.environ['DATABASE_URL'])
+    try:
+        with conn.cursor() as cur:
+            data = seed(cur, args.chats)
+        conn.commit()
+        try:
+            report = {mode: run(conn, registry, data, args.iterations) for mode, registry in registries.items()}
+        finally:
+            with conn.cursor() as cur:
+                cleanup(cur, data)
+            conn.commit()
+    finally:
+        conn.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{'statement':<22}{'plan adhoc ms':>15}{'plan prep ms':>14}{'adhoc ops/s':>13}{'prep ops/s':>12}{'speedup':>9}")
+    for name in report['adhoc']:
+        adhoc, prepared = report['adhoc'][name], report['prepared'][name]
+        print(
+            f"{name:<22}{adhoc['planning_ms']:>15.3f}{prepared['planning_ms']:>14.3f}"
+            f"{adhoc['ops_per_sec']:>13.0f}{prepared['ops_per_sec']:>12.0f}"
+            f"{prepared['ops_per_sec'] / adhoc['ops_per_sec']:>8.2f}x"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,2 @@
+-- Keyset pagination of chat history: each page is a range scan on (chat_id, id)
+CREATE INDEX IF NOT EXISTS idx_messages_chat_id_id ON messages(chat_id, id DESC);
@@ -0,0 +1,27 @@
+-- Denormalized chat summary, maintained by the messages 'send' action
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS last_message_id INTEGER;
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS last_message_preview TEXT;
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS last_message_at TIMESTAMP;
+
+-- Per-participant unread counter
+ALTER TABLE chat_participants ADD COLUMN IF NOT EXISTS unread_count INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill from existing messages
+UPDATE chats c
+SET last_message_id = m.id,
+    last_message_preview = LEFT(m.content, 200),
+    last_message_at = m.created_at
+FROM (
+    SELECT DISTINCT ON (chat_id) id, chat_id, content, created_at
+    FROM messages
+    ORDER BY chat_id, id DESC
+) m
+WHERE m.chat_id = c.id;
+
+UPDATE chat_participants cp
+SET unread_count = (
+    SELECT COUNT(*) FROM messages m
+    WHERE m.chat_id = cp.chat_id AND m.is_read = false AND m.sender_id != cp.user_id
+);
+
+CREATE INDEX IF NOT EXISTS idx_chats_updated_at ON chats(updated_at DESC);
@@ -0,0 +1,16 @@
+-- WebRTC signaling queue (previously created on the fly by the signaling 'offer' action)
+CREATE TABLE IF NOT EXISTS call_signals (
+    id SERIAL PRIMARY KEY,
+    from_user_id INTEGER NOT NULL,
+    to_user_id INTEGER NOT NULL,
+    signal_type VARCHAR(20) NOT NULL,
+    signal_data TEXT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    is_read BOOLEAN DEFAULT false
+);
+
+-- Delivered signals are now deleted on consumption; drop the backlog left by the old read-flag scheme
+DELETE FROM call_signals WHERE is_read = true;
+
+CREATE INDEX IF NOT EXISTS idx_call_signals_to_user_id ON call_signals(to_user_id, id);
+CREATE INDEX IF NOT EXISTS idx_call_signals_created_at ON call_signals(created_at);
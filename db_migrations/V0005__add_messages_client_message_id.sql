@@ -0,0 +1,6 @@
+-- Client-supplied idempotency key for bulk sends
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS client_message_id VARCHAR(64);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_sender_client_message_id
+    ON messages(sender_id, client_message_id)
+    WHERE client_message_id IS NOT NULL;
@@ -0,0 +1,3 @@
+-- Per-participant read watermark; unread = messages after it from other senders
+ALTER TABLE chat_participants ADD COLUMN IF NOT EXISTS last_read_message_id INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE chat_participants ADD COLUMN IF NOT EXISTS read_at TIMESTAMP;
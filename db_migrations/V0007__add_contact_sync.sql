@@ -0,0 +1,13 @@
+-- SHA-256 of the phone number, so clients can match address books without uploading raw numbers
+ALTER TABLE users ADD COLUMN IF NOT EXISTS phone_hash VARCHAR(64)
+    GENERATED ALWAYS AS (encode(sha256(phone_number::text::bytea), 'hex')) STORED;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_users_phone_hash ON users(phone_hash);
+
+-- Server-side copy of each user's synced address book, for incremental re-sync
+CREATE TABLE IF NOT EXISTS user_contacts (
+    owner_id INTEGER NOT NULL REFERENCES users(id),
+    phone_hash VARCHAR(64) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (owner_id, phone_hash)
+);
@@ -0,0 +1,22 @@
+-- Canonical (min(user_id), max(user_id)) key for private chats
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS pair_user_low INTEGER;
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS pair_user_high INTEGER;
+
+-- Backfill the oldest private chat of every pair; later duplicates keep a NULL key
+UPDATE chats c
+SET pair_user_low = p.low, pair_user_high = p.high
+FROM (
+    SELECT DISTINCT ON (low, high) chat_id, low, high
+    FROM (
+        SELECT cp.chat_id, MIN(cp.user_id) AS low, MAX(cp.user_id) AS high
+        FROM chat_participants cp
+        JOIN chats pc ON pc.id = cp.chat_id AND pc.type = 'private'
+        GROUP BY cp.chat_id
+    ) pairs
+    ORDER BY low, high, chat_id
+) p
+WHERE c.id = p.chat_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_chats_private_pair
+    ON chats(pair_user_low, pair_user_high)
+    WHERE type = 'private';
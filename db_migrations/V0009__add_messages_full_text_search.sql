@@ -0,0 +1,7 @@
+-- Full-text search over text messages
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        CASE WHEN type = 'text' THEN to_tsvector('simple', content) END
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_messages_search_vector ON messages USING GIN (search_vector);
@@ -0,0 +1,182 @@
+-- Idempotency keys move to their own table: a unique index on a partitioned
+-- table must include the partition key, which would defeat deduplication
+CREATE TABLE IF NOT EXISTS message_client_ids (
+    sender_id INTEGER NOT NULL,
+    client_message_id VARCHAR(64) NOT NULL,
+    message_id INTEGER NOT NULL,
+    chat_id INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL,
+    PRIMARY KEY (sender_id, client_message_id)
+);
+
+INSERT INTO message_client_ids (sender_id, client_message_id, message_id, chat_id, created_at)
+SELECT sender_id, client_message_id, id, chat_id, created_at
+FROM messages
+WHERE client_message_id IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+-- The existing heap becomes the first partition
+DROP INDEX IF EXISTS idx_messages_sender_client_message_id;
+DROP INDEX IF EXISTS idx_messages_chat_id;
+DROP INDEX IF EXISTS idx_messages_created_at;
+ALTER TABLE messages DROP COLUMN IF EXISTS client_message_id;
+UPDATE messages SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+ALTER TABLE messages ALTER COLUMN created_at SET NOT NULL;
+
+ALTER TABLE messages DROP CONSTRAINT messages_pkey;
+ALTER TABLE messages RENAME TO messages_legacy;
+ALTER INDEX idx_messages_chat_id_id RENAME TO messages_legacy_chat_id_id_idx;
+ALTER INDEX idx_messages_search_vector RENAME TO messages_legacy_search_vector_idx;
+
+CREATE TABLE messages (
+    id INTEGER NOT NULL DEFAULT nextval('messages_id_seq'),
+    chat_id INTEGER NOT NULL CONSTRAINT messages_chat_id_fkey REFERENCES chats(id),
+    sender_id INTEGER NOT NULL CONSTRAINT messages_sender_id_fkey REFERENCES users(id),
+    content TEXT NOT NULL,
+    type VARCHAR(20) DEFAULT 'text' CONSTRAINT messages_type_check CHECK (type IN ('text', 'image', 'file', 'voice')),
+    is_read BOOLEAN DEFAULT false,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    search_vector tsvector GENERATED ALWAYS AS (
+        CASE WHEN type = 'text' THEN to_tsvector('simple', content) END
+    ) STORED,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+ALTER SEQUENCE messages_id_seq OWNED BY messages.id;
+
+CREATE INDEX IF NOT EXISTS idx_messages_chat_id_id ON messages(chat_id, id DESC);
+CREATE INDEX IF NOT EXISTS idx_messages_chat_created_at ON messages(chat_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_messages_search_vector ON messages USING GIN (search_vector);
+
+-- Monthly partitions named messages_pYYYYMM, created ahead of time by the maintenance job
+CREATE OR REPLACE FUNCTION create_messages_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start TIMESTAMP := date_trunc('month', CURRENT_TIMESTAMP)::timestamp;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR i IN 0..months_ahead LOOP
+        partition_name := 'messages_p' || to_char(month_start, 'YYYYMM');
+        IF to_regclass(partition_name) IS NULL THEN
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_start + INTERVAL '1 month'
+                );
+                created := created + 1;
+            EXCEPTION WHEN invalid_object_definition THEN
+                -- month already covered by another partition (e.g. messages_legacy)
+                NULL;
+            END;
+        END IF;
+        month_start := month_start + INTERVAL '1 month';
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Everything up to the end of the current month stays in the legacy partition.
+-- Validating a CHECK first lets ATTACH skip its own full-table scan under an exclusive lock.
+DO $$
+DECLARE
+    legacy_end TIMESTAMP := date_trunc('month', CURRENT_TIMESTAMP)::timestamp + INTERVAL '1 month';
+BEGIN
+    EXECUTE format(
+        'ALTER TABLE messages_legacy ADD CONSTRAINT messages_legacy_range CHECK (created_at < %L) NOT VALID',
+        legacy_end
+    );
+    ALTER TABLE messages_legacy VALIDATE CONSTRAINT messages_legacy_range;
+    EXECUTE format(
+        'ALTER TABLE messages ATTACH PARTITION messages_legacy FOR VALUES FROM (MINVALUE) TO (%L)',
+        legacy_end
+    );
+    ALTER TABLE messages_legacy DROP CONSTRAINT messages_legacy_range;
+END;
+$$;
+
+SELECT create_messages_partitions(3);
+
+-- Cold store: compressed (TOAST) JSON blocks of up to 1000 messages per chat per archived partition
+CREATE TABLE IF NOT EXISTS messages_archive (
+    chat_id INTEGER NOT NULL,
+    partition_name VARCHAR(64) NOT NULL,
+    chunk INTEGER NOT NULL,
+    first_id INTEGER NOT NULL,
+    last_id INTEGER NOT NULL,
+    first_created_at TIMESTAMP NOT NULL,
+    last_created_at TIMESTAMP NOT NULL,
+    message_count INTEGER NOT NULL,
+    payload JSONB NOT NULL,
+    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (chat_id, partition_name, chunk)
+);
+
+CREATE INDEX IF NOT EXISTS idx_messages_archive_chat_last ON messages_archive(chat_id, last_created_at DESC, last_id DESC);
+
+CREATE OR REPLACE VIEW messages_archived AS
+SELECT r.id, a.chat_id, r.sender_id, r.content, r.type, r.created_at
+FROM messages_archive a
+CROSS JOIN LATERAL jsonb_to_recordset(a.payload)
+    AS r(id INTEGER, sender_id INTEGER, content TEXT, type VARCHAR(20), created_at TIMESTAMP);
+
+-- Fold a whole partition into messages_archive, then detach and drop it
+CREATE OR REPLACE FUNCTION archive_messages_partition(target TEXT)
+RETURNS INTEGER AS $$
+DECLARE
+    archived INTEGER;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'messages'::regclass AND c.relname = target
+    ) THEN
+        RAISE EXCEPTION '% is not a partition of messages', target;
+    END IF;
+
+    EXECUTE format(
+        'INSERT INTO messages_archive (chat_id, partition_name, chunk, first_id, last_id,
+            first_created_at, last_created_at, message_count, payload)
+        SELECT chat_id, %L, chunk, MIN(id), MAX(id), MIN(created_at), MAX(created_at), COUNT(*),
+            jsonb_agg(jsonb_build_object(
+                ''id'', id, ''sender_id'', sender_id, ''content'', content,
+                ''type'', type, ''created_at'', created_at
+            ) ORDER BY created_at, id)
+        FROM (
+            SELECT *, (row_number() OVER (PARTITION BY chat_id ORDER BY created_at, id) - 1) / 1000 AS chunk
+            FROM %I
+        ) m
+        GROUP BY chat_id, chunk
+        ON CONFLICT (chat_id, partition_name, chunk) DO NOTHING',
+        target, target
+    );
+    GET DIAGNOSTICS archived = ROW_COUNT;
+
+    EXECUTE format('ALTER TABLE messages DETACH PARTITION %I', target);
+    EXECUTE format('DROP TABLE %I', target);
+    RETURN archived;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Archive every partition that ends on or before the cutoff
+CREATE OR REPLACE FUNCTION archive_messages_before(cutoff TIMESTAMP)
+RETURNS TABLE (partition_name TEXT, blocks INTEGER) AS $$
+DECLARE
+    part RECORD;
+BEGIN
+    FOR part IN
+        SELECT c.relname,
+            substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \(''([^'']+)''\)')::timestamp AS upper_bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'messages'::regclass
+        ORDER BY upper_bound
+    LOOP
+        IF part.upper_bound IS NOT NULL AND part.upper_bound <= cutoff THEN
+            partition_name := part.relname;
+            blocks := archive_messages_partition(part.relname);
+            RETURN NEXT;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
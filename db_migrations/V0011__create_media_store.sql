@@ -0,0 +1,73 @@
+-- Content-addressed media: one row (and one stored file) per distinct SHA-256
+CREATE TABLE IF NOT EXISTS media_blobs (
+    sha256 CHAR(64) PRIMARY KEY,
+    size BIGINT NOT NULL,
+    mime_type VARCHAR(100) NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    has_thumbnail BOOLEAN NOT NULL DEFAULT false,
+    created_by INTEGER REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Resumable uploads in progress; chunks live in the media store until completion
+CREATE TABLE IF NOT EXISTS media_uploads (
+    id VARCHAR(64) PRIMARY KEY,
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    file_name VARCHAR(255),
+    mime_type VARCHAR(100) NOT NULL,
+    size BIGINT NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    sha256 CHAR(64),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_media_uploads_expires_at ON media_uploads(expires_at);
+
+-- Media messages reference a blob; content keeps the caption or file name
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS media_sha256 CHAR(64)
+    CONSTRAINT messages_media_sha256_fkey REFERENCES media_blobs(sha256);
+
+CREATE OR REPLACE VIEW messages_archived AS
+SELECT r.id, a.chat_id, r.sender_id, r.content, r.type, r.created_at, r.media_sha256
+FROM messages_archive a
+CROSS JOIN LATERAL jsonb_to_recordset(a.payload)
+    AS r(id INTEGER, sender_id INTEGER, content TEXT, type VARCHAR(20), created_at TIMESTAMP, media_sha256 CHAR(64));
+
+CREATE OR REPLACE FUNCTION archive_messages_partition(target TEXT)
+RETURNS INTEGER AS $$
+DECLARE
+    archived INTEGER;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'messages'::regclass AND c.relname = target
+    ) THEN
+        RAISE EXCEPTION '% is not a partition of messages', target;
+    END IF;
+
+    EXECUTE format(
+        'INSERT INTO messages_archive (chat_id, partition_name, chunk, first_id, last_id,
+            first_created_at, last_created_at, message_count, payload)
+        SELECT chat_id, %L, chunk, MIN(id), MAX(id), MIN(created_at), MAX(created_at), COUNT(*),
+            jsonb_agg(jsonb_strip_nulls(jsonb_build_object(
+                ''id'', id, ''sender_id'', sender_id, ''content'', content,
+                ''type'', type, ''created_at'', created_at, ''media_sha256'', media_sha256
+            )) ORDER BY created_at, id)
+        FROM (
+            SELECT *, (row_number() OVER (PARTITION BY chat_id ORDER BY created_at, id) - 1) / 1000 AS chunk
+            FROM %I
+        ) m
+        GROUP BY chat_id, chunk
+        ON CONFLICT (chat_id, partition_name, chunk) DO NOTHING',
+        target, target
+    );
+    GET DIAGNOSTICS archived = ROW_COUNT;
+
+    EXECUTE format('ALTER TABLE messages DETACH PARTITION %I', target);
+    EXECUTE format('DROP TABLE %I', target);
+    RETURN archived;
+END;
+$$ LANGUAGE plpgsql;
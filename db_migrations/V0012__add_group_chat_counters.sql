@@ -0,0 +1,18 @@
+-- Group unread = chats.message_count - chat_participants.read_count, so a message to a
+-- large group updates one chats row instead of every member's unread_count
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS message_count BIGINT NOT NULL DEFAULT 0;
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS created_by INTEGER REFERENCES users(id);
+ALTER TABLE chat_participants ADD COLUMN IF NOT EXISTS read_count BIGINT NOT NULL DEFAULT 0;
+
+UPDATE chats c
+SET message_count = m.n
+FROM (SELECT chat_id, COUNT(*) AS n FROM messages GROUP BY chat_id) m
+WHERE m.chat_id = c.id;
+
+UPDATE chat_participants cp
+SET read_count = (
+    SELECT COUNT(*) FROM messages m
+    WHERE m.chat_id = cp.chat_id AND m.id <= cp.last_read_message_id
+)
+FROM chats c
+WHERE c.id = cp.chat_id AND c.type = 'group';
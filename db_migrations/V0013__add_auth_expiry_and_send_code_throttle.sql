@@ -0,0 +1,10 @@
+-- send_code throttling counts the codes requested per phone and per IP in a sliding window,
+-- so each code remembers where it was requested from
+ALTER TABLE verification_codes ADD COLUMN IF NOT EXISTS requested_ip VARCHAR(45);
+
+CREATE INDEX IF NOT EXISTS idx_verification_codes_ip
+    ON verification_codes(requested_ip, created_at) WHERE requested_ip IS NOT NULL;
+
+-- The maintenance sweeper deletes oldest-first in small batches
+CREATE INDEX IF NOT EXISTS idx_verification_codes_created_at ON verification_codes(created_at);
+CREATE INDEX IF NOT EXISTS idx_auth_sessions_expires_at ON auth_sessions(expires_at);
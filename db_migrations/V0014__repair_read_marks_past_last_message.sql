@@ -0,0 +1,13 @@
+-- mark_read did not clamp the client's message_id, so a read mark could point past the chat's
+-- last message and show every later message as read. Rebuild such marks from the unread
+-- counters, which stayed correct: the newest <unread> counted messages stay unread.
+UPDATE chat_participants cp
+SET last_read_message_id = COALESCE((
+    SELECT m.id FROM messages m
+    WHERE m.chat_id = cp.chat_id AND (c.type = 'group' OR m.sender_id != cp.user_id)
+    ORDER BY m.id DESC
+    OFFSET CASE WHEN c.type = 'group' THEN GREATEST(c.message_count - cp.read_count, 0) ELSE cp.unread_count END
+    LIMIT 1
+), 0)
+FROM chats c
+WHERE c.id = cp.chat_id AND cp.last_read_message_id > COALESCE(c.last_message_id, 0);
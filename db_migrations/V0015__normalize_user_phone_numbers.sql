@@ -0,0 +1,16 @@
+-- Login used to store phone_number exactly as typed, while contact sync hashes the normalized
+-- form (digits, + kept when typed), so users who typed spaces or dashes were never matched.
+-- Normalize existing numbers; numbers whose normal forms collide are left as they are
+-- rather than merging the accounts.
+UPDATE users u
+SET phone_number = n.normalized
+FROM (
+    SELECT id, normalized, COUNT(*) OVER (PARTITION BY normalized) AS owners
+    FROM (
+        SELECT id,
+            CASE WHEN btrim(phone_number) LIKE '+%' THEN '+' ELSE '' END
+                || regexp_replace(phone_number, '\D', '', 'g') AS normalized
+        FROM users
+    ) s
+) n
+WHERE n.id = u.id AND n.owners = 1 AND n.normalized <> u.phone_number AND n.normalized NOT IN ('', '+');
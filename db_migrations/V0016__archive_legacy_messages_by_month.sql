@@ -0,0 +1,83 @@
+-- messages_legacy holds all pre-partitioning history in one partition, so archiving it whole
+-- would copy everything in one transaction and then detach it under ACCESS EXCLUSIVE.
+-- Archive it a month at a time instead (each month copied and deleted in its own short
+-- transaction) and only detach the partition once it is empty.
+DO $$
+BEGIN
+    IF to_regclass('messages_legacy') IS NOT NULL THEN
+        CREATE INDEX IF NOT EXISTS messages_legacy_created_at_idx ON messages_legacy(created_at);
+    END IF;
+END;
+$$;
+
+-- Fold the oldest month left in messages_legacy into messages_archive, if it ends by the cutoff
+CREATE OR REPLACE FUNCTION archive_legacy_messages_month(cutoff TIMESTAMP)
+RETURNS TABLE (partition_name TEXT, blocks INTEGER, messages INTEGER) AS $$
+DECLARE
+    month_start TIMESTAMP;
+    month_end TIMESTAMP;
+BEGIN
+    IF to_regclass('messages_legacy') IS NULL THEN
+        RETURN;
+    END IF;
+
+    SELECT date_trunc('month', MIN(l.created_at)) INTO month_start FROM messages_legacy l;
+    month_end := month_start + INTERVAL '1 month';
+    IF month_start IS NULL OR month_end > cutoff THEN
+        RETURN;
+    END IF;
+
+    partition_name := 'messages_legacy_' || to_char(month_start, 'YYYYMM');
+    INSERT INTO messages_archive (chat_id, partition_name, chunk, first_id, last_id,
+        first_created_at, last_created_at, message_count, payload)
+    SELECT m.chat_id, archive_legacy_messages_month.partition_name, m.chunk, MIN(m.id), MAX(m.id),
+        MIN(m.created_at), MAX(m.created_at), COUNT(*),
+        jsonb_agg(jsonb_strip_nulls(jsonb_build_object(
+            'id', m.id, 'sender_id', m.sender_id, 'content', m.content,
+            'type', m.type, 'created_at', m.created_at, 'media_sha256', m.media_sha256
+        )) ORDER BY m.created_at, m.id)
+    FROM (
+        SELECT l.*, (row_number() OVER (PARTITION BY l.chat_id ORDER BY l.created_at, l.id) - 1) / 1000 AS chunk
+        FROM messages_legacy l
+        WHERE l.created_at >= month_start AND l.created_at < month_end
+    ) m
+    GROUP BY m.chat_id, m.chunk
+    ON CONFLICT ON CONSTRAINT messages_archive_pkey DO NOTHING;
+    GET DIAGNOSTICS blocks = ROW_COUNT;
+
+    DELETE FROM messages_legacy l WHERE l.created_at >= month_start AND l.created_at < month_end;
+    GET DIAGNOSTICS messages = ROW_COUNT;
+    RETURN NEXT;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Same as before, except messages_legacy is only detached once the monthly passes emptied it
+CREATE OR REPLACE FUNCTION archive_messages_before(cutoff TIMESTAMP)
+RETURNS TABLE (partition_name TEXT, blocks INTEGER) AS $$
+DECLARE
+    part RECORD;
+    legacy_rows BOOLEAN;
+BEGIN
+    FOR part IN
+        SELECT c.relname,
+            substring(pg_get_expr(c.relpartbound, c.oid) FROM 'TO \(''([^'']+)''\)')::timestamp AS upper_bound
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'messages'::regclass
+        ORDER BY upper_bound
+    LOOP
+        IF part.upper_bound IS NOT NULL AND part.upper_bound <= cutoff THEN
+            IF part.relname = 'messages_legacy' THEN
+                EXECUTE 'SELECT EXISTS (SELECT 1 FROM messages_legacy)' INTO legacy_rows;
+                CONTINUE WHEN legacy_rows;
+            END IF;
+            partition_name := part.relname;
+            blocks := archive_messages_partition(part.relname);
+            RETURN NEXT;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Lets the maintenance sweep expire idempotency keys oldest-first
+CREATE INDEX IF NOT EXISTS idx_message_client_ids_created_at ON message_client_ids(created_at);
@@ -0,0 +1,30 @@
+-- Who may read or attach a blob: users whose own upload the server hashed to it, and members
+-- of chats whose messages reference it (kept here so access survives message archiving)
+CREATE TABLE IF NOT EXISTS media_owners (
+    sha256 CHAR(64) NOT NULL REFERENCES media_blobs(sha256),
+    user_id INTEGER NOT NULL REFERENCES users(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (sha256, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS chat_media (
+    sha256 CHAR(64) NOT NULL REFERENCES media_blobs(sha256),
+    chat_id INTEGER NOT NULL REFERENCES chats(id),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (sha256, chat_id)
+);
+
+INSERT INTO media_owners (sha256, user_id)
+SELECT sha256, created_by FROM media_blobs WHERE created_by IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+INSERT INTO chat_media (sha256, chat_id)
+SELECT DISTINCT media_sha256, chat_id FROM messages WHERE media_sha256 IS NOT NULL
+ON CONFLICT DO NOTHING;
+
+INSERT INTO chat_media (sha256, chat_id)
+SELECT DISTINCT r.media_sha256, a.chat_id
+FROM messages_archive a
+CROSS JOIN LATERAL jsonb_to_recordset(a.payload) AS r(media_sha256 CHAR(64))
+WHERE r.media_sha256 IS NOT NULL
+ON CONFLICT DO NOTHING;
@@ -0,0 +1,56 @@
+-- Sends must not start failing with "no partition of relation found for row" when the maintenance
+-- timer lapses for longer than it creates partitions ahead. Rows past the last monthly partition
+-- land in messages_default instead; the next create_partitions run moves them into their month.
+CREATE TABLE IF NOT EXISTS messages_default PARTITION OF messages DEFAULT;
+
+-- Monthly partitions named messages_pYYYYMM, for the months ahead and for any month that has rows
+-- stranded in messages_default. Such a month cannot be created as a partition next to its rows, so
+-- the default partition is detached, the month created and its rows moved over, and the default
+-- attached again, all in the caller's transaction.
+CREATE OR REPLACE FUNCTION create_messages_partitions(months_ahead INTEGER DEFAULT 3)
+RETURNS INTEGER AS $$
+DECLARE
+    this_month TIMESTAMP := date_trunc('month', CURRENT_TIMESTAMP)::timestamp;
+    month_start TIMESTAMP;
+    month_end TIMESTAMP;
+    partition_name TEXT;
+    stranded BOOLEAN;
+    created INTEGER := 0;
+BEGIN
+    FOR month_start IN
+        SELECT generate_series(this_month, this_month + make_interval(months => months_ahead), INTERVAL '1 month')
+        UNION
+        SELECT DISTINCT date_trunc('month', created_at) FROM messages_default
+        ORDER BY 1
+    LOOP
+        partition_name := 'messages_p' || to_char(month_start, 'YYYYMM');
+        month_end := month_start + INTERVAL '1 month';
+        IF to_regclass(partition_name) IS NULL THEN
+            SELECT EXISTS (
+                SELECT 1 FROM messages_default WHERE created_at >= month_start AND created_at < month_end
+            ) INTO stranded;
+            BEGIN
+                IF stranded THEN
+                    ALTER TABLE messages DETACH PARTITION messages_default;
+                END IF;
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF messages FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+                IF stranded THEN
+                    INSERT INTO messages (id, chat_id, sender_id, content, type, is_read, created_at, media_sha256)
+                    SELECT id, chat_id, sender_id, content, type, is_read, created_at, media_sha256
+                    FROM messages_default WHERE created_at >= month_start AND created_at < month_end;
+                    DELETE FROM messages_default WHERE created_at >= month_start AND created_at < month_end;
+                    ALTER TABLE messages ATTACH PARTITION messages_default DEFAULT;
+                END IF;
+                created := created + 1;
+            EXCEPTION WHEN invalid_object_definition THEN
+                -- month already covered by another partition (e.g. messages_legacy)
+                NULL;
+            END;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
@@ -4,10 +4,37 @@ const AUTH_URL = '3c8cdd77-9aa5-42dc-9fb7-5d598252a04c';
 const MESSAGES_URL = '77153e37-44c4-447f-8000-09f09dfc829b';
 const SIGNALING_URL = '861f2fbd-00c4-4dc1-80eb-11c30a34c596';
 
+const WRITE_POSITION_HEADER = 'X-Write-LSN';
+
+// Primary WAL position of this client's latest write. Echoed on every request so reads
+// served from a replica wait for it, whichever backend instance handles them.
+let writePosition: string | null = null;
+
+const parseLsn = (lsn: string): [number, number] => {
+  const [high, low] = lsn.split('/');
+  return [parseInt(high, 16), parseInt(low, 16)];
+};
+
+const isNewerLsn = (lsn: string, than: string | null) => {
+  if (!than) return true;
+  const [high, low] = parseLsn(lsn);
+  const [thanHigh, thanLow] = parseLsn(than);
+  return high > thanHigh || (high === thanHigh && low > thanLow);
+};
+
+const apiFetch = async (url: string, init: RequestInit = {}) => {
+  const headers = new Headers(init.headers);
+  if (writePosition) headers.set(WRITE_POSITION_HEADER, writePosition);
+  const response = await fetch(url, { ...init, headers });
+  const position = response.headers.get(WRITE_POSITION_HEADER);
+  if (position && isNewerLsn(position, writePosition)) writePosition = position;
+  return response;
+};
+
 export const api = {
   auth: {
     sendCode: async (phoneNumber: string) => {
-      const response = await fetch(`${API_BASE}/${AUTH_URL}`, {
+      const response = await apiFetch(`${API_BASE}/${AUTH_URL}`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -19,7 +46,7 @@ export const api = {
     },
 
     verifyCode: async (phoneNumber: string, code: string) => {
-      const response = await fetch(`${API_BASE}/${AUTH_URL}`, {
+      const response = await apiFetch(`${API_BASE}/${AUTH_URL}`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -32,25 +59,59 @@ export const api = {
     },
 
     getUser: async (sessionToken: string) => {
-      const response = await fetch(`${API_BASE}/${AUTH_URL}`, {
+      const response = await apiFetch(`${API_BASE}/${AUTH_URL}`, {
         method: 'GET',
         headers: { 'X-Session-Token': sessionToken }
       });
       return response.json();
+    },
+
+    logout: async (sessionToken: string) => {
+      const response = await apiFetch(`${API_BASE}/${AUTH_URL}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Session-Token': sessionToken
+        },
+        body: JSON.stringify({ action: 'logout' })
+      });
+      return response.json();
     }
   },
 
   messages: {
     getChats: async (sessionToken: string) => {
-      const response = await fetch(`${API_BASE}/${MESSAGES_URL}`, {
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}`, {
+        method: 'GET',
+        headers: { 'X-Session-Token': sessionToken }
+      });
+      return response.json();
+    },
+
+    getChatMessages: async (sessionToken: string, chatId: number, cursor?: string) => {
+      const params = new URLSearchParams({ chat_id: String(chatId) });
+      if (cursor) params.set('cursor', cursor);
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}?${params}`, {
         method: 'GET',
         headers: { 'X-Session-Token': sessionToken }
       });
       return response.json();
     },
 
-    getChatMessages: async (sessionToken: string, chatId: number) => {
-      const response = await fetch(`${API_BASE}/${MESSAGES_URL}?chat_id=${chatId}`, {
+    syncChatMessages: async (sessionToken: string, chatId: number, syncToken: string) => {
+      const params = new URLSearchParams({ chat_id: String(chatId), sync_token: syncToken });
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}?${params}`, {
+        method: 'GET',
+        headers: { 'X-Session-Token': sessionToken }
+      });
+      return response.json();
+    },
+
+    searchMessages: async (sessionToken: string, query: string, chatId?: number, cursor?: string) => {
+      const params = new URLSearchParams({ q: query });
+      if (chatId) params.set('chat_id', String(chatId));
+      if (cursor) params.set('cursor', cursor);
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}?${params}`, {
         method: 'GET',
         headers: { 'X-Session-Token': sessionToken }
       });
@@ -58,7 +119,7 @@ export const api = {
     },
 
     sendMessage: async (sessionToken: string, chatId: number, content: string) => {
-      const response = await fetch(`${API_BASE}/${MESSAGES_URL}`, {
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -74,8 +135,80 @@ export const api = {
       return response.json();
     },
 
+    sendMessagesBatch: async (
+      sessionToken: string,
+      messages: { chat_id: number; content: string; client_id: string; type?: string }[]
+    ) => {
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Session-Token': sessionToken
+        },
+        body: JSON.stringify({
+          action: 'send_batch',
+          messages
+        })
+      });
+      return response.json();
+    },
+
+    markRead: async (sessionToken: string, chatId: number, messageId?: number) => {
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Session-Token': sessionToken
+        },
+        body: JSON.stringify({
+          action: 'mark_read',
+          chat_id: chatId,
+          message_id: messageId
+        })
+      });
+      return response.json();
+    },
+
+    syncContacts: async (
+      sessionToken: string,
+      changes: { phone_numbers?: string[]; removed_numbers?: string[]; full?: boolean }
+    ) => {
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Session-Token': sessionToken
+        },
+        body: JSON.stringify({
+          action: 'sync_contacts',
+          ...changes
+        })
+      });
+      return response.json();
+    },
+
+    heartbeat: async (sessionToken: string) => {
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Session-Token': sessionToken
+        },
+        body: JSON.stringify({ action: 'heartbeat' })
+      });
+      return response.json();
+    },
+
+    getPresence: async (sessionToken: string, userIds: number[]) => {
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}?presence=${userIds.join(',')}`, {
+        method: 'GET',
+        headers: { 'X-Session-Token': sessionToken }
+      });
+      return response.json();
+    },
+
     createChat: async (sessionToken: string, participantPhone: string) => {
-      const response = await fetch(`${API_BASE}/${MESSAGES_URL}`, {
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -87,12 +220,28 @@ export const api = {
         })
       });
       return response.json();
+    },
+
+    createGroup: async (sessionToken: string, name: string, memberIds: number[]) => {
+      const response = await apiFetch(`${API_BASE}/${MESSAGES_URL}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+          'X-Session-Token': sessionToken
+        },
+        body: JSON.stringify({
+          action: 'create_group',
+          name,
+          member_ids: memberIds
+        })
+      });
+      return response.json();
     }
   },
 
   signaling: {
-    pollSignals: async (sessionToken: string) => {
-      const response = await fetch(`${API_BASE}/${SIGNALING_URL}`, {
+    pollSignals: async (sessionToken: string, waitSeconds = 0) => {
+      const response = await apiFetch(`${API_BASE}/${SIGNALING_URL}?wait=${waitSeconds}`, {
         method: 'GET',
         headers: { 'X-Session-Token': sessionToken }
       });
@@ -1,5 +1,8 @@
 const API_BASE = 'https://functions.poehali.dev';
 const SIGNALING_URL = '861f2fbd-00c4-4dc1-80eb-11c30a34c596';
+const LONG_POLL_WAIT_SECONDS = 25;
+const POLL_RETRY_DELAY_MS = 1000;
+const ICE_BATCH_DELAY_MS = 50;
 
 const ICE_SERVERS = [
   { urls: 'stun:stun.l.google.com:19302' },
@@ -12,7 +15,10 @@ export class WebRTCCall {
   private remoteStream: MediaStream | null = null;
   private sessionToken: string;
   private targetUserId: number;
-  private pollingInterval: NodeJS.Timeout | null = null;
+  private polling = false;
+  private pollAbort: AbortController | null = null;
+  private pendingIceCandidates: RTCIceCandidate[] = [];
+  private iceFlushTimer: ReturnType<typeof setTimeout> | null = null;
   private onRemoteStreamCallback: ((stream: MediaStream) => void) | null = null;
   private onCallEndCallback: (() => void) | null = null;
 
@@ -46,9 +52,9 @@ export class WebRTCCall {
       }
     };
 
-    this.peerConnection.onicecandidate = async (event) => {
+    this.peerConnection.onicecandidate = (event) => {
       if (event.candidate) {
-        await this.sendSignal('ice_candidate', { candidate: event.candidate });
+        this.queueIceCandidate(event.candidate);
       }
     };
 
@@ -87,9 +93,9 @@ export class WebRTCCall {
       }
     };
 
-    this.peerConnection.onicecandidate = async (event) => {
+    this.peerConnection.onicecandidate = (event) => {
       if (event.candidate) {
-        await this.sendSignal('ice_candidate', { candidate: event.candidate });
+        this.queueIceCandidate(event.candidate);
       }
     };
 
@@ -120,23 +126,59 @@ export class WebRTCCall {
     });
   }
 
+  private queueIceCandidate(candidate: RTCIceCandidate) {
+    this.pendingIceCandidates.push(candidate);
+    if (!this.iceFlushTimer) {
+      this.iceFlushTimer = setTimeout(() => this.flushIceCandidates(), ICE_BATCH_DELAY_MS);
+    }
+  }
+
+  private async flushIceCandidates() {
+    this.iceFlushTimer = null;
+    const candidates = this.pendingIceCandidates;
+    this.pendingIceCandidates = [];
+    if (candidates.length > 0) {
+      await this.sendSignal('ice_candidates', { candidates });
+    }
+  }
+
   private startPolling() {
-    this.pollingInterval = setInterval(async () => {
-      const response = await fetch(`${API_BASE}/${SIGNALING_URL}`, {
-        method: 'GET',
-        headers: { 'X-Session-Token': this.sessionToken }
-      });
-      
-      const data = await response.json();
-      
-      if (data.success && data.signals) {
-        for (const signal of data.signals) {
-          if (signal.from_user_id === this.targetUserId) {
+    this.polling = true;
+    this.pollLoop();
+  }
+
+  private async pollLoop() {
+    while (this.polling) {
+      this.pollAbort = new AbortController();
+      try {
+        const response = await fetch(`${API_BASE}/${SIGNALING_URL}?wait=${LONG_POLL_WAIT_SECONDS}&from_user_id=${this.targetUserId}`, {
+          method: 'GET',
+          headers: { 'X-Session-Token': this.sessionToken },
+          signal: this.pollAbort.signal
+        });
+
+        if (response.status === 401) {
+          this.polling = false;
+          break;
+        }
+
+        if (!response.ok) {
+          await new Promise(resolve => setTimeout(resolve, POLL_RETRY_DELAY_MS));
+          continue;
+        }
+
+        const data = await response.json();
+
+        if (data.success && data.signals) {
+          for (const signal of data.signals) {
             await this.handleSignal(signal);
           }
         }
+      } catch (error) {
+        if (!this.polling) break;
+        await new Promise(resolve => setTimeout(resolve, POLL_RETRY_DELAY_MS));
       }
-    }, 1000);
+    }
   }
 
   private async handleSignal(signal: any) {
@@ -163,8 +205,12 @@ export class WebRTCCall {
   }
 
   endCall() {
-    if (this.pollingInterval) {
-      clearInterval(this.pollingInterval);
+    this.polling = false;
+    if (this.iceFlushTimer) {
+      clearTimeout(this.iceFlushTimer);
+    }
+    if (this.pollAbort) {
+      this.pollAbort.abort();
     }
 
     if (this.localStream) {
@@ -13,6 +13,8 @@ import { Separator } from '@/components/ui/separator';
 import { api, getSessionToken, setSessionToken, clearSessionToken, getCurrentUser, setCurrentUser, clearCurrentUser } from '@/lib/api';
 import { WebRTCCall } from '@/lib/webrtc';
 
+const HEARTBEAT_INTERVAL_MS = 30000;
+
 interface Chat {
   id: number;
   name: string;
@@ -148,6 +150,17 @@ export default function Index() {
     }
   }, [importedContacts, isAuthenticated]);
 
+  useEffect(() => {
+    if (!isAuthenticated) return;
+    const beat = () => {
+      const sessionToken = getSessionToken();
+      if (sessionToken) api.messages.heartbeat(sessionToken).catch(() => {});
+    };
+    beat();
+    const interval = setInterval(beat, HEARTBEAT_INTERVAL_MS);
+    return () => clearInterval(interval);
+  }, [isAuthenticated]);
+
   useEffect(() => {
     let interval: NodeJS.Timeout;
     if (isCallActive) {
@@ -335,6 +348,10 @@ export default function Index() {
   };
 
   const handleLogout = () => {
+    const sessionToken = getSessionToken();
+    if (sessionToken) {
+      api.auth.logout(sessionToken).catch(() => {});
+    }
     clearSessionToken();
     clearCurrentUser();
     setIsAuthenticated(false);